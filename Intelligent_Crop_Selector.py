@@ -1,40 +1,155 @@
-import pickle
+import io
+import time
 import streamlit as st
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-
-# Load the model in Keras format
-model = load_model('Intelligent_Crop_Selector')
-#load the pickled label encoder for one-hot encoding
-with open('label_encoder.pkl', 'rb') as label_encoder_file:
-    label_encoder = pickle.load(label_encoder_file)
-# Load the scaler for standardizing input features
-with open('scaler.pkl', 'rb') as scaler_file:
-    scaler = pickle.load(scaler_file)
+
+# The model, scaler and label encoder are loaded lazily, once per process
+from crop_artifacts import artifact_fingerprint, load_artifacts, load_timings
+from prediction_cache import prediction_cache
+from crop_metrics import count, render_metrics_sidebar, timed
+from prediction_log import DRIFT_THRESHOLD, drift_report, prediction_log
 
 def predict_crop(nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall):
     try:
         # Create a numpy array from the user input
         input_data = np.array([[nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall]])
 
-        # Standardize the input features using the loaded scaler
-        input_data_scaled = scaler.transform(input_data)
-
-        # Use the model to make a prediction
-        prediction = model.predict(input_data_scaled)
+        # Standardize the input features and make a prediction with the selected engine
+        prediction = load_artifacts().predict_proba(input_data)
+        count('predictions')
 
         return prediction[0]
     except Exception as e:
         st.error(f"Error during prediction: {e}")
         return None
 
-def decode_one_hot(prediction):
-    # Assuming prediction is a one-hot encoded array
-    predicted_class = np.argmax(prediction)
-    return predicted_class
+def cached_predict_crop(nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall):
+    """predict_crop memoized on quantized inputs through the shared prediction cache."""
+    features = (nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall)
+    prediction = prediction_cache.get_or_compute(features, lambda: predict_crop(*features))
+    # Log every request, cache hits included, so the drift monitor sees what users actually enter
+    if prediction is not None:
+        prediction_log.record(features, int(predicted_classes(prediction)[0]))
+    return prediction
+
+# Input features in the same order as the columns of data/304_dataset.csv
+FEATURE_COLUMNS = ['Nitrogen(pmm)', 'Phosphorus(pmm)', 'Potassium(mm)', 'temperature(F)', 'humidity', 'soil_ph', 'rainfall(mm)']
+
+# Number of rows standardized and scored per model call in batch mode
+BATCH_SIZE = 8192
+
+def predict_crop_batch(input_data, batch_size=BATCH_SIZE):
+    """Scores many rows of input features in vectorized chunks.
+    Args: array-like of shape (n_rows, 7) in FEATURE_COLUMNS order, chunk size.
+    Returns: np.ndarray of shape (n_rows, n_classes) with the model output.
+    """
+    artifacts = load_artifacts()
+    input_data = np.asarray(input_data, dtype=float)
+    predictions = []
+    for start in range(0, len(input_data), batch_size):
+        # Standardize and predict a whole chunk at once
+        predictions.append(artifacts.predict_proba(input_data[start:start + batch_size], batch_size=batch_size))
+    count('rows_scored', len(input_data))
+    if not predictions:
+        return np.empty((0, artifacts.n_classes), dtype=np.float32)
+    return np.concatenate(predictions)
+
+def predicted_classes(predictions):
+    """Picks the most likely crop of every row.
+    Args: model output from predict_crop (one row) or predict_crop_batch (n_rows, n_classes).
+    Returns: np.ndarray of label encoder indices, one per row.
+    """
+    # Only outputs with a crop name can win, as in top_k_crops
+    n_labels = len(load_artifacts().label_encoder)
+    return np.argmax(np.atleast_2d(predictions)[:, :n_labels], axis=1)
+
+@timed('decode_predictions')
+def decode_predictions(predictions):
+    """Decodes a batch of one-hot style predictions into crop names.
+    Args: np.ndarray of shape (n_rows, n_classes).
+    Returns: np.ndarray of crop names, one per row.
+    """
+    return np.asarray(load_artifacts().label_encoder)[predicted_classes(predictions)]
+
+# Number of ranked crops returned with a prediction
+TOP_K = 3
+
+@timed('top_k_crops')
+def top_k_crops(predictions, k=TOP_K):
+    """Ranks the k most likely crops of every row, with calibrated probabilities.
+    Args: model output from predict_crop (one row) or predict_crop_batch (n_rows, n_classes), number of crops.
+    Returns: tuple of (np.ndarray of crop names, np.ndarray of probabilities), both (n_rows, k), best first.
+    """
+    artifacts = load_artifacts()
+    probabilities = artifacts.calibrate(np.atleast_2d(predictions))
+    k = min(k, probabilities.shape[1])
+    # Select the k best of every row in one linear pass, then sort only those k
+    top = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    top_probabilities = np.take_along_axis(probabilities, top, axis=1)
+    order = np.argsort(-top_probabilities, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    return np.asarray(artifacts.label_encoder)[top], np.take_along_axis(top_probabilities, order, axis=1)
+
+def add_predicted_crop(data, batch_size=BATCH_SIZE, top_k=0):
+    """Scores a frame laid out like data/304_dataset.csv, adding a predicted_crop column in place.
+    Args: pd.DataFrame with the FEATURE_COLUMNS, chunk size passed to predict_crop_batch,
+    number of ranked crops to add as top_crop_<i> and top_probability_<i> columns (0 for none).
+    Returns: tuple of (feature array, boolean mask of the rows that have every feature).
+    """
+    input_data = data[FEATURE_COLUMNS].to_numpy(dtype=float)
+    predictions = predict_crop_batch(input_data, batch_size=batch_size)
+    # Rows with missing values get no prediction rather than an arbitrary class
+    complete = np.isfinite(input_data).all(axis=1)
+    data['predicted_crop'] = np.where(complete, decode_predictions(predictions), None)
+    prediction_log.record_batch(input_data[complete], predicted_classes(predictions[complete]))
+    if top_k > 0 and complete.any():
+        # Ranked from the same forward pass, so runner-up crops cost no extra model calls
+        crops, probabilities = top_k_crops(predictions[complete], top_k)
+        for i in range(crops.shape[1]):
+            data.loc[complete, f'top_crop_{i + 1}'] = crops[:, i]
+            data.loc[complete, f'top_probability_{i + 1}'] = probabilities[:, i].round(4)
+    return input_data, complete
+
+def score_csv(csv_file, batch_size=BATCH_SIZE, neighbours=0, top_k=0):
+    """Scores every row of a CSV laid out like data/304_dataset.csv.
+    Args: path or file-like object of the CSV, chunk size passed to predict_crop_batch,
+    number of most similar historical fields to add per row (0 for none),
+    number of ranked crops with probabilities to add per row (0 for none).
+    Returns: tuple of (pd.DataFrame with a predicted_crop column added, rows per second).
+    """
+    with timed('csv_load'):
+        data = pd.read_csv(csv_file)
+    missing = [col for col in FEATURE_COLUMNS if col not in data.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+
+    # Load the artifacts up front so the throughput excludes the cold start
+    load_artifacts()
+
+    start = time.perf_counter()
+    input_data, complete = add_predicted_crop(data, batch_size, top_k)
+    elapsed = time.perf_counter() - start
+
+    if neighbours > 0 and complete.any():
+        from similar_fields import load_similar_fields_index
+
+        # One batched KD-tree query for every complete row
+        _, distances, labels = load_similar_fields_index().query(input_data[complete], k=neighbours)
+        for i in range(labels.shape[1]):
+            data.loc[complete, f'similar_crop_{i + 1}'] = labels[:, i]
+            data.loc[complete, f'similar_distance_{i + 1}'] = distances[:, i].round(4)
+
+    rows_per_second = len(data) / elapsed if elapsed > 0 else float('inf')
+    return data, rows_per_second
 
+@st.cache_data(max_entries=8, show_spinner="Scoring the uploaded file...")
+def score_uploaded_csv(csv_bytes, neighbours, top_k, fingerprint):
+    """score_csv for an uploaded file, cached on its bytes, the options and the artifacts on disk.
+    Streamlit reruns the script on every interaction; the cache keeps those reruns from scoring
+    the file again, and from logging its rows to the drift monitor more than once.
+    """
+    return score_csv(io.BytesIO(csv_bytes), neighbours=neighbours, top_k=top_k)
 
 
 def main():
@@ -77,21 +192,111 @@ def main():
     if st.button("Predict Crop"):
         # Validate that all input values are non-default
         if all([nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall]):
-            crop_prediction = predict_crop(nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall)
+            crop_prediction = cached_predict_crop(nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall)
 
             if crop_prediction is not None:
                 try:
-                    # Decode one-hot encoded prediction
-                    predicted_class = decode_one_hot(crop_prediction)
-
-                    # Decode the predicted class to crop name using label encoder
-                    predicted_crop = label_encoder[predicted_class]
+                    # Rank the known crops; the model's extra outputs have no crop name
+                    crops, probabilities = top_k_crops(crop_prediction)
+                    predicted_crop = crops[0, 0]
 
                     st.success(f"The recommended crop for the climatic condition is: {predicted_crop}")
+                    show_top_crops(crops, probabilities)
+                    show_similar_fields([nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall])
                 except Exception as e:
                     st.error(f"Error during label decoding: {e}")
         else:
             st.warning("Please enter non-default values for all parameters.")
 
+    # Batch mode for soil-lab exports with many fields at once
+    st.subheader("Bulk CSV Scoring")
+    uploaded_file = st.file_uploader("Upload a CSV with the same columns as the training dataset", type="csv")
+    include_similar = st.checkbox("Add the 3 most similar historical fields to each row")
+    include_top_crops = st.checkbox(f"Add the {TOP_K} most likely crops with their probabilities to each row")
+
+    if uploaded_file is not None:
+        try:
+            results, rows_per_second = score_uploaded_csv(uploaded_file.getvalue(), 3 if include_similar else 0,
+                                                          TOP_K if include_top_crops else 0, artifact_fingerprint())
+
+            st.success(f"Scored {len(results):,} rows at {rows_per_second:,.0f} rows/second")
+            st.dataframe(results.head(100))
+
+            # Offer the scored file for download
+            output = io.StringIO()
+            results.to_csv(output, index=False)
+            st.download_button("Download Predictions", output.getvalue(),
+                               file_name="crop_predictions.csv", mime="text/csv")
+        except Exception as e:
+            st.error(f"Error during bulk scoring: {e}")
+
+    show_load_timings()
+    show_cache_stats()
+    show_drift_report()
+    render_metrics_sidebar()
+
+def show_top_crops(crops, probabilities):
+    """Shows the most likely crops for one prediction with their calibrated probabilities.
+    Args: crop names and probabilities from top_k_crops, both of shape (1, k).
+    """
+    st.write(f"Top {len(crops[0])} crops for these conditions:")
+    st.table(pd.DataFrame({'Crop': crops[0], 'Probability': [f"{p:.1%}" for p in probabilities[0]]},
+                          index=range(1, len(crops[0]) + 1)))
+
+def show_similar_fields(features):
+    """Shows the historical records closest to the entered conditions."""
+    try:
+        from similar_fields import load_similar_fields_index
+
+        start = time.perf_counter()
+        similar = load_similar_fields_index().similar_fields(features)
+        elapsed = time.perf_counter() - start
+        st.subheader("Most Similar Historical Fields")
+        st.dataframe(similar.round(2))
+        st.caption(f"Nearest-neighbour lookup took {elapsed * 1000:,.1f} ms")
+    except Exception as e:
+        st.error(f"Error during similar field lookup: {e}")
+
+def show_load_timings():
+    """Shows how long the shared artifacts took to load in this process."""
+    timings = load_timings()
+    if timings['cold_start'] is None:
+        st.sidebar.caption("Model not loaded yet: it loads on the first prediction.")
+        return
+
+    st.sidebar.subheader("Model Load Timings")
+    cold_start = timings['cold_start']
+    st.sidebar.text(f"Cold start ({cold_start['engine']}): {cold_start['total'] * 1000:,.0f} ms")
+    if 'tensorflow_import' in cold_start:
+        st.sidebar.text(f"  TensorFlow import: {cold_start['tensorflow_import'] * 1000:,.0f} ms")
+    st.sidebar.text(f"  Model: {cold_start['model'] * 1000:,.0f} ms")
+    st.sidebar.text(f"  Scaler + encoder: {(cold_start['scaler'] + cold_start['label_encoder']) * 1000:,.1f} ms")
+    if timings['warm_start'] is not None:
+        st.sidebar.text(f"Warm start: {timings['warm_start'] * 1e6:,.1f} µs ({timings['warm_calls']} reuses)")
+
+def show_cache_stats():
+    """Shows the hit/miss/eviction counters of the shared prediction cache."""
+    stats = prediction_cache.stats()
+    st.sidebar.subheader("Prediction Cache")
+    st.sidebar.text(f"Entries: {stats['size']:,} / {stats['maxsize']:,}")
+    st.sidebar.text(f"Hits: {stats['hits']:,}  Misses: {stats['misses']:,} ({stats['hit_rate']:.0%} hit rate)")
+    st.sidebar.text(f"Evictions: {stats['evictions']:,}  Expired: {stats['expirations']:,}")
+    st.sidebar.text(f"Invalidations: {stats['invalidations']:,}")
+
+def show_drift_report():
+    """Shows how far the logged prediction inputs have drifted from the training data."""
+    if prediction_log.path is None:
+        return
+    st.sidebar.subheader("Input Drift")
+    report = drift_report()
+    if not report['predictions']:
+        st.sidebar.caption(f"No predictions logged in the last {report['hours']:g} hours: "
+                           "the log is written about once a minute.")
+        return
+    st.sidebar.text(f"{report['predictions']:,} predictions in the last {report['hours']:g} hours")
+    for feature, score in report['scores'].items():
+        flag = " (drift)" if score > DRIFT_THRESHOLD else ""
+        st.sidebar.text(f"{feature}: KS {score:.2f}{flag}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,252 @@
+"""Load test: how many concurrent sessions one app process serves, and how fast.
+
+Usage:
+    python benchmarks/load_test.py                                 # 1, 2, 4 and 8 sessions, 30 s each
+    python benchmarks/load_test.py --sessions 1 4 16 32 --duration 60
+
+Every concurrency level runs in a fresh process, like a freshly started
+server. Each simulated session is a thread with its own Streamlit AppTest
+per script, so sessions share the process's caches, model and GIL, as they
+would in `streamlit run`. Browser rendering and the websocket are not
+included. A session keeps picking a script at random and performing one
+interaction, which is one script rerun:
+    - Intelligent_Crop_Selector.py: enter a jittered row of the dataset and press Predict Crop
+    - pages/**/*.py: pick a random option in one selectbox, e.g. a crop category
+
+Dashboard sections are opened at random when a session starts. Each level
+reports throughput, latency percentiles per script, errors, and the
+process's resident memory after warm-up and at peak. The results are
+written to benchmarks/load_results.json.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from crop_data import DATA_PATH  # noqa: E402
+
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, 'load_results.json')
+
+MAIN_SCRIPT = os.path.join(ROOT_DIR, 'Intelligent_Crop_Selector.py')
+PAGE_SCRIPTS = sorted(glob.glob(os.path.join(ROOT_DIR, 'pages', '**', '*.py'), recursive=True))
+
+# Collapsible dashboard sections, opened at random per session
+SECTION_KEYS = ('section_pies', 'section_line_chart', 'section_pair_plot', 'section_correlation')
+
+# Share of interactions that are predictions; the rest are spread evenly over the pages
+PREDICT_SHARE = 0.5
+
+# Longest a single rerun may take before the session records a timeout
+RUN_TIMEOUT = 300
+
+
+def _memory_mb(field):
+    """Reads VmRSS (current) or VmHWM (peak) resident memory of this process, in megabytes."""
+    with open('/proc/self/status') as status_file:
+        for line in status_file:
+            if line.startswith(f'{field}:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def _share_script_cache():
+    """Makes every AppTest use one script cache, as `streamlit run` does for all sessions of a process.
+    AppTest otherwise recompiles the script on every run, which is slower than a server and not
+    thread-safe on every Python version.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+class Session:
+    """One simulated user, with its own widget state in every script."""
+
+    def __init__(self, index, seed, rows):
+        self.index = index
+        self.rng = np.random.default_rng(seed + index)
+        self.rows = rows
+        self.apps = {}
+        self.sections = {key: bool(self.rng.random() < 0.5) for key in SECTION_KEYS}
+
+    def _app(self, script):
+        from streamlit.testing.v1 import AppTest
+
+        if script not in self.apps:
+            app = AppTest.from_file(script, default_timeout=RUN_TIMEOUT)
+            for key, is_open in self.sections.items():
+                app.session_state[key] = is_open
+            app.run()
+            self.apps[script] = app
+        return self.apps[script]
+
+    def warm_up(self):
+        for script in [MAIN_SCRIPT] + PAGE_SCRIPTS:
+            self._app(script)
+
+    def interact(self):
+        """Performs one random interaction.
+        Returns: tuple of (script name, seconds, error message or None).
+        """
+        if not PAGE_SCRIPTS or self.rng.random() < PREDICT_SHARE:
+            script = MAIN_SCRIPT
+        else:
+            script = PAGE_SCRIPTS[self.rng.integers(len(PAGE_SCRIPTS))]
+        app = self._app(script)
+        start = time.perf_counter()
+        try:
+            if script == MAIN_SCRIPT:
+                row = self.rows[self.rng.integers(len(self.rows))]
+                row = row * self.rng.normal(1.0, 0.05, size=len(row))
+                for number_input, value in zip(app.number_input, row):
+                    number_input.set_value(round(float(value), 2))
+                app.button[0].click().run()
+            elif len(app.selectbox):
+                selectbox = app.selectbox[int(self.rng.integers(len(app.selectbox)))]
+                selectbox.select_index(int(self.rng.integers(len(selectbox.options)))).run()
+            else:
+                app.run()
+            error = app.exception[0].value if len(app.exception) else None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return os.path.relpath(script, ROOT_DIR), time.perf_counter() - start, error
+
+
+def _latency_summary(latencies):
+    latencies = np.asarray(latencies)
+    return {
+        'count': int(len(latencies)),
+        'p50_seconds': float(np.percentile(latencies, 50)),
+        'p95_seconds': float(np.percentile(latencies, 95)),
+        'p99_seconds': float(np.percentile(latencies, 99)),
+        'max_seconds': float(latencies.max()),
+    }
+
+
+def run_level(n_sessions, duration, seed=0):
+    """Drives n_sessions concurrent sessions in this process for duration seconds.
+    Returns: dict with throughput, latency percentiles overall and per script, errors and memory.
+    """
+    _share_script_cache()
+    rows = pd.read_csv(DATA_PATH).dropna().iloc[:, :7].to_numpy(dtype=float)
+    sessions = [Session(i, seed, rows) for i in range(n_sessions)]
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session.warm_up) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    warm_up_seconds = time.perf_counter() - start
+    rss_after_warm_up = _memory_mb('VmRSS')
+
+    results, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def drive(session):
+        while time.perf_counter() < deadline:
+            result = session.interact()
+            with lock:
+                results.append(result)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=drive, args=(session,)) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    errors = [f"{script}: {error}" for script, _, error in results if error]
+    per_script = {}
+    for script in sorted({script for script, _, _ in results}):
+        per_script[script] = _latency_summary([seconds for name, seconds, _ in results if name == script])
+    return {
+        'sessions': n_sessions,
+        'interactions': len(results),
+        'seconds': elapsed,
+        'interactions_per_second': len(results) / elapsed if elapsed else 0.0,
+        'latency': _latency_summary([seconds for _, seconds, _ in results]) if results else None,
+        'per_script': per_script,
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'warm_up_seconds': warm_up_seconds,
+        'rss_after_warm_up_mb': rss_after_warm_up,
+        'rss_mb': _memory_mb('VmRSS'),
+        'peak_rss_mb': _memory_mb('VmHWM'),
+    }
+
+
+def run_level_in_subprocess(n_sessions, duration, seed=0):
+    """Runs one concurrency level in a fresh interpreter, so memory and caches start cold.
+    Prediction logging is off there, so the synthetic traffic stays out of the drift monitor.
+    """
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--level', str(n_sessions), '--duration', str(duration),
+         '--seed', str(seed)], cwd=ROOT_DIR, capture_output=True, text=True,
+        env={**os.environ, 'CROP_PREDICTION_LOG': '0'})
+    if result.returncode != 0:
+        raise RuntimeError(f"{n_sessions} session(s) failed: "
+                           f"{(result.stderr.strip().splitlines() or ['no output'])[-1]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8], help="Concurrency levels to run")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of load per level, after warm-up")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=RESULTS_PATH)
+    # Internal: run a single level in this process and print it as JSON
+    parser.add_argument('--level', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.level:
+        print(json.dumps(run_level(args.level, args.duration, args.seed)))
+        return 0
+
+    levels = []
+    print(f"{'sessions':>8} {'actions':>8} {'per s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} "
+          f"{'RSS MB':>8} {'peak MB':>8}")
+    for n_sessions in args.sessions:
+        level = run_level_in_subprocess(n_sessions, args.duration, args.seed)
+        levels.append(level)
+        latency = level['latency'] or {'p50_seconds': 0.0, 'p95_seconds': 0.0, 'p99_seconds': 0.0}
+        print(f"{n_sessions:>8} {level['interactions']:>8} {level['interactions_per_second']:>8.2f} "
+              f"{latency['p50_seconds'] * 1000:>8.0f} {latency['p95_seconds'] * 1000:>8.0f} "
+              f"{latency['p99_seconds'] * 1000:>8.0f} {level['errors']:>7} {level['rss_mb']:>8.0f} "
+              f"{level['peak_rss_mb']:>8.0f}")
+        for sample in level['error_samples']:
+            print(f"         {sample}")
+
+    results = {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'cpu_count': os.cpu_count(),
+            'engine': os.environ.get('CROP_ENGINE', 'auto'),
+            'duration_seconds': args.duration,
+            'scripts': [os.path.relpath(script, ROOT_DIR) for script in [MAIN_SCRIPT] + PAGE_SCRIPTS],
+        },
+        'levels': levels,
+    }
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
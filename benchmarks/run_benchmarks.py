@@ -0,0 +1,339 @@
+"""Offline benchmark suite for the crop predictor and the dashboard pages.
+
+Usage:
+    python benchmarks/run_benchmarks.py                      # run, write results, compare with baseline
+    python benchmarks/run_benchmarks.py --scales 1 10 100 1000
+    python benchmarks/run_benchmarks.py --update-baseline    # store this run as the new baseline
+    python benchmarks/run_benchmarks.py --runs 9             # best of 9 runs of the suite (default 5)
+
+Everything runs against the bundled artifacts and data/304_dataset.csv, plus
+synthetic copies of the dataset scaled 10x/100x/1000x. Results go to
+benchmarks/results.json. The run fails (exit code 1) when a metric regresses
+beyond --threshold relative to benchmarks/baseline.json, and also by more than
+its noise floor. Each metric is its best over --runs runs of the suite, each
+in a fresh process, on both sides of the comparison. Times are compared
+relative to a fixed reference workload timed alongside them, so a machine
+that is slower throughout does not read as a regression (a faster one is not
+counted against the code). Metrics ending in
+_per_second are higher-is-better; all others are times in seconds. Cold-start
+metrics, measured once per run in a fresh process, are reported but not
+compared.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from crop_data import DATA_PATH, clean_crop_data  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, 'results.json')
+
+BATCH_SIZES = (1, 32, 1024, 8192, 65536)
+PAIR_PLOT_FEATURES = ["temperature_f", "humidity", "rainfall_mm", "nitrogen_pmm", "phosphorus_pmm", "potassium_mm"]
+
+# Measured once, in a fresh process, so they swing with disk cache and scheduler state; reported only.
+# reference_seconds measures the machine, not the code.
+UNGATED_METRICS = ('reference_seconds', 'cold_import_seconds', 'artifact_load_total_seconds', 'model_load_seconds',
+                   'scaler_load_seconds', 'label_encoder_load_seconds', '1x_seaborn_pair_plot_figure_seconds')
+
+# Slowdown in seconds per call that a metric must also exceed to count as a regression, by metric
+# name suffix. Scheduler noise alone moves millisecond timings by more than any relative threshold,
+# and Plotly figure builds by tens of milliseconds between runs on a shared CPU. A floor never
+# exceeds NOISE_FLOOR_FRACTION of the metric's baseline, so a 2x slowdown always fails.
+NOISE_FLOOR_SECONDS = 0.005
+NOISE_FLOORS = {'predict_crop_p50_seconds': 0.00005, 'predict_crop_p99_seconds': 0.0005, '_figure_seconds': 0.04}
+NOISE_FLOOR_FRACTION = 0.75
+
+# Allowed relative regression. Best-of-run timings of the same code still differ by up to about 35%
+# between runs on a shared CPU; a 2x slowdown is well past it.
+DEFAULT_THRESHOLD = 0.5
+
+
+def measure(fn, repeat=7):
+    """Returns the fastest wall time of fn() in seconds, over repeat calls.
+    Noise only ever adds time, so the minimum is the steadiest estimate of the cost itself. As in
+    timeit, the cyclic garbage collector is paused, since its passes land in whichever call is running.
+    """
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return float(np.min(times))
+
+
+def run_python(code):
+    """Runs code in a fresh interpreter at the repository root and returns its wall time and stdout."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout
+
+
+def make_synthetic_dataset(scale, path, seed=0):
+    """Writes a raw CSV like data/304_dataset.csv with scale times as many rows.
+    Rows are resampled from the original and jittered, so deduplication keeps most of them.
+    """
+    raw = pd.read_csv(DATA_PATH).dropna()
+    if scale == 1:
+        raw.to_csv(path, index=False)
+        return
+    rng = np.random.default_rng(seed)
+    synthetic = raw.iloc[rng.integers(0, len(raw), len(raw) * scale)].reset_index(drop=True)
+    numeric = synthetic.columns[:-1]
+    noise = rng.normal(0, 0.01, size=(len(synthetic), len(numeric))) * synthetic[numeric].std().to_numpy()
+    synthetic[numeric] = (synthetic[numeric].to_numpy() + noise).round(4)
+    synthetic.to_csv(path, index=False)
+
+
+_reference_rng = np.random.default_rng(0)
+REFERENCE_VALUES = _reference_rng.normal(size=200_000)
+REFERENCE_FRAME = pd.DataFrame({'key': _reference_rng.integers(0, 24, 200_000), 'value': REFERENCE_VALUES})
+
+
+def reference_workload():
+    """Fixed mix of NumPy, pandas and interpreter work whose cost depends only on the machine."""
+    np.sort(REFERENCE_VALUES)
+    REFERENCE_FRAME.groupby('key')['value'].mean()
+    sum(i * i for i in range(100_000))
+
+
+def bench_reference(metrics):
+    # Timed before every section, so the best of them sees the machine at its fastest, like the metrics
+    seconds = measure(reference_workload)
+    metrics['reference_seconds'] = min(seconds, metrics.get('reference_seconds', seconds))
+
+
+def bench_startup(metrics):
+    interpreter, _ = run_python('pass')
+    import_time, _ = run_python('import Intelligent_Crop_Selector')
+    metrics['cold_import_seconds'] = max(import_time - interpreter, 0.0)
+
+    # Load the artifacts in a fresh process so the numbers are true cold starts
+    _, output = run_python('import json; from crop_artifacts import load_artifacts, load_timings; '
+                           'load_artifacts(); print(json.dumps(load_timings()["cold_start"]))')
+    cold_start = json.loads(output)
+    metrics['artifact_load_total_seconds'] = cold_start['total']
+    metrics['model_load_seconds'] = cold_start['model']
+    metrics['scaler_load_seconds'] = cold_start['scaler']
+    metrics['label_encoder_load_seconds'] = cold_start['label_encoder']
+
+
+def bench_prediction(metrics, n_single=5000):
+    from crop_artifacts import load_artifacts
+    from Intelligent_Crop_Selector import decode_predictions, predict_crop, predict_crop_batch
+
+    load_artifacts()
+    raw = pd.read_csv(DATA_PATH).dropna()
+    rows = raw.iloc[:, :7].to_numpy(dtype=float)
+
+    latencies = []
+    for i in range(n_single):
+        start = time.perf_counter()
+        predict_crop(*rows[i % len(rows)])
+        latencies.append(time.perf_counter() - start)
+    metrics['predict_crop_p50_seconds'] = float(np.percentile(latencies, 50))
+    metrics['predict_crop_p99_seconds'] = float(np.percentile(latencies, 99))
+
+    for batch_size in BATCH_SIZES:
+        batch = rows[np.arange(batch_size) % len(rows)]
+        seconds = measure(lambda: decode_predictions(predict_crop_batch(batch)))
+        metrics[f'batch_{batch_size}_rows_per_second'] = batch_size / seconds
+
+
+def bench_dashboards(metrics, scale, csv_path):
+    from crop_charts import (build_correlation_heatmap, build_line_chart, build_npk_pie, build_pair_plot,
+                             build_thr_pie)
+    from crop_data import compact_dtypes
+    from crop_summary import ALL, CropSummaryCube
+
+    prefix = f'{scale}x_'
+    repeat = 7 if scale <= 10 else 3
+
+    metrics[prefix + 'read_csv_seconds'] = measure(lambda: pd.read_csv(csv_path), repeat)
+    raw = pd.read_csv(csv_path)
+    metrics[prefix + 'clean_crop_data_seconds'] = measure(lambda: clean_crop_data(raw.copy()), repeat)
+    crop_data = compact_dtypes(clean_crop_data(raw.copy()))
+
+    metrics[prefix + 'pivot_table_seconds'] = measure(
+        lambda: pd.pivot_table(crop_data, index=['label'], aggfunc='mean', observed=True), repeat)
+    metrics[prefix + 'summary_cube_build_seconds'] = measure(lambda: CropSummaryCube.from_frame(crop_data), repeat)
+    cube = CropSummaryCube.from_frame(crop_data)
+    metrics[prefix + 'frame_corr_seconds'] = measure(lambda: crop_data[PAIR_PLOT_FEATURES].corr(), repeat)
+    metrics[prefix + 'cube_corr_seconds'] = measure(lambda: cube.correlation(ALL, PAIR_PLOT_FEATURES), repeat)
+
+    plant = 'All'
+    metrics[prefix + 'npk_pie_figure_seconds'] = measure(
+        lambda: build_npk_pie(cube.mean(ALL), plant), repeat)
+    metrics[prefix + 'thr_pie_figure_seconds'] = measure(
+        lambda: build_thr_pie(cube.mean(ALL), plant), repeat)
+    metrics[prefix + 'line_chart_figure_seconds'] = measure(
+        lambda: build_line_chart(crop_data, plant), repeat)
+    metrics[prefix + 'pair_plot_figure_seconds'] = measure(
+        lambda: build_pair_plot(crop_data, PAIR_PLOT_FEATURES, plant), repeat)
+    metrics[prefix + 'correlation_heatmap_figure_seconds'] = measure(
+        lambda: build_correlation_heatmap(cube.correlation(ALL, PAIR_PLOT_FEATURES), plant), repeat)
+
+    if scale == 1:
+        # The seaborn pair plot draws every row, so it is only timed on the original data
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        def seaborn_pair_plot():
+            pair_plot = sns.pairplot(crop_data[PAIR_PLOT_FEATURES + ['label']].astype({'label': str}), hue='label')
+            plt.close(pair_plot.figure)
+
+        metrics['1x_seaborn_pair_plot_figure_seconds'] = measure(seaborn_pair_plot, repeat=1)
+
+
+def seconds_per_call(name, value):
+    """Converts a batch_<rows>_rows_per_second metric to seconds per call; times are returned as they are."""
+    if name.endswith('_rows_per_second'):
+        return int(name.split('_')[1]) / value
+    return value
+
+
+def compare(metrics, baseline, threshold):
+    """Returns a list of messages, one for each metric that regressed beyond threshold and its noise floor.
+    Times are first scaled by how much faster the machine ran the reference workload for the baseline.
+    A machine that ran it faster now is not held against the code: the reference shares some of the
+    noise of the metrics, and a baseline reference timed in a slow spell would scale every time up.
+    """
+    machine_speed = 1.0
+    if metrics.get('reference_seconds') and baseline.get('reference_seconds'):
+        machine_speed = min(1.0, baseline['reference_seconds'] / metrics['reference_seconds'])
+    regressions = []
+    for name, base in baseline.items():
+        value = metrics.get(name)
+        if value is None or not base or not value or name in UNGATED_METRICS:
+            continue
+        base_seconds, seconds = seconds_per_call(name, base), seconds_per_call(name, value) * machine_speed
+        change = (seconds - base_seconds) / base_seconds
+        noise_floor = min(next((floor for suffix, floor in NOISE_FLOORS.items() if name.endswith(suffix)),
+                               NOISE_FLOOR_SECONDS), NOISE_FLOOR_FRACTION * base_seconds)
+        if change > threshold and seconds - base_seconds > noise_floor:
+            regressions.append(f"{name}: {base:.6g} -> {value:.6g} ({change:+.0%} worse at baseline machine speed)")
+    return regressions
+
+
+def synthetic_path(data_dir, scale):
+    return os.path.join(data_dir, f'crop_data_{scale}x.csv')
+
+
+def run_suite(scales, data_dir):
+    """Runs every benchmark once in this process.
+    Returns: dict of metric name to value.
+    """
+    run = {}
+    bench_startup(run)
+    bench_reference(run)
+    bench_prediction(run)
+    for scale in scales:
+        bench_reference(run)
+        bench_dashboards(run, scale, synthetic_path(data_dir, scale))
+    return run
+
+
+def run_suite_in_subprocess(scales, data_dir):
+    """Runs the suite once in a fresh interpreter.
+    Some timings settle into a fast or a slow mode for the life of a process, so runs in one
+    process would all share it.
+    """
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--scales', *map(str, scales), '--data-dir', data_dir,
+         '--single-run'], cwd=ROOT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed: {(result.stderr.strip().splitlines() or ['no output'])[-1]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative regression before failing (default 0.5 = 50%%)")
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--runs', type=int, default=5, help="Runs of the suite; each metric keeps its best")
+    # Internal: run the suite once on datasets already in --data-dir and print the metrics as JSON
+    parser.add_argument('--data-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--single-run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_run:
+        print(json.dumps(run_suite(args.scales, args.data_dir)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            make_synthetic_dataset(scale, synthetic_path(tmp_dir, scale))
+        runs = [run_suite_in_subprocess(args.scales, tmp_dir) for _ in range(args.runs)]
+    # Interference from other tenants comes in phases of seconds to minutes, and some timings keep a
+    # fast or slow mode for a whole process; runs in separate processes, spaced apart, escape both,
+    # so each metric keeps its best run
+    metrics = {name: (max if name.endswith('_per_second') else min)(run[name] for run in runs) for name in runs[0]}
+
+    results = {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'engine': os.environ.get('CROP_ENGINE', 'auto'),
+            'scales': args.scales,
+            'runs': args.runs,
+        },
+        'metrics': metrics,
+    }
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+    for name, value in metrics.items():
+        print(f"{name:50s} {value:14.6g}")
+    print(f"Wrote {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Updated baseline {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)['metrics']
+    if 'reference_seconds' in baseline:
+        print(f"Reference workload: {baseline['reference_seconds'] * 1000:.2f} ms in the baseline, "
+              f"{metrics['reference_seconds'] * 1000:.2f} ms now")
+    regressions = compare(metrics, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
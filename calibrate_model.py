@@ -0,0 +1,120 @@
+"""Fits a softmax temperature that calibrates the crop model's probabilities.
+
+Usage: python calibrate_model.py [--data PATH] [--output calibration.json]
+
+Temperature scaling divides the model's logits by one scalar T, chosen to
+minimize the negative log-likelihood of the true crops. T > 1 softens
+overconfident probabilities and T < 1 sharpens underconfident ones. Rankings
+and accuracy do not change. The fitted T is written to calibration.json with
+the SHA-256 of Intelligent_Crop_Selector.npz, so a retrained model falls back
+to T = 1 until it is recalibrated. The log-likelihood and expected
+calibration error are reported before and after.
+
+--data is a raw CSV or cleaned Parquet, as for train_model.py. Data the model
+was not trained on gives the most honest temperature.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+from scipy.optimize import minimize_scalar
+
+from crop_artifacts import BASE_DIR, CALIBRATION_PATH, load_artifacts, model_sha256
+from crop_data import DATA_PATH, FEATURES
+from train_model import load_training_data
+
+# Range searched for the temperature
+MIN_TEMPERATURE = 0.05
+MAX_TEMPERATURE = 20.0
+
+
+def negative_log_likelihood(probabilities, labels):
+    """Mean negative log-probability of the true class."""
+    return float(-np.log(np.maximum(probabilities[np.arange(len(labels)), labels], 1e-30)).mean())
+
+
+def expected_calibration_error(probabilities, labels, n_bins=15):
+    """Gap between confidence and accuracy, averaged over equal-width confidence bins."""
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+    bins = np.minimum((confidence * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    gaps = np.abs(np.bincount(bins, weights=confidence, minlength=n_bins) -
+                  np.bincount(bins, weights=correct, minlength=n_bins))
+    return float(gaps.sum() / counts.sum())
+
+
+def fit_temperature(artifacts, predictions, labels):
+    """Finds the temperature that minimizes the negative log-likelihood.
+    Args: CropArtifacts, model output of shape (n_rows, n_classes), true class indices.
+    Returns: fitted temperature.
+    """
+    # Search log T, where the likelihood is smooth and the range is symmetric around T = 1
+    result = minimize_scalar(
+        lambda log_t: negative_log_likelihood(artifacts.calibrate(predictions, np.exp(log_t)), labels),
+        bounds=(np.log(MIN_TEMPERATURE), np.log(MAX_TEMPERATURE)), method='bounded')
+    return float(np.exp(result.x))
+
+
+def calibration_metrics(artifacts, predictions, labels, temperature):
+    probabilities = artifacts.calibrate(predictions, temperature)
+    return {
+        'negative_log_likelihood': round(negative_log_likelihood(probabilities, labels), 6),
+        'expected_calibration_error': round(expected_calibration_error(probabilities, labels), 6),
+        'mean_top_probability': round(float(probabilities.max(axis=1).mean()), 6),
+    }
+
+
+def calibrate(data_path=DATA_PATH):
+    """Scores labelled data with the current model and fits its temperature.
+    Returns: dict ready to be written as calibration.json.
+    """
+    crop_data, data_sha256 = load_training_data(data_path)
+    artifacts = load_artifacts()
+    classes = {str(label): i for i, label in enumerate(artifacts.label_encoder)}
+    labels = crop_data['label'].map(classes)
+    # Crops the model was not trained on cannot be calibrated against
+    known = labels.notna().to_numpy()
+    labels = labels[known].to_numpy(dtype=np.int64)
+    predictions = artifacts.predict_proba(crop_data[FEATURES].to_numpy(dtype=np.float64)[known])
+
+    temperature = fit_temperature(artifacts, predictions, labels)
+    return {
+        'temperature': round(temperature, 6),
+        'model_sha256': model_sha256(),
+        'engine': artifacts.engine,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'data': {'path': os.path.relpath(data_path, BASE_DIR), 'sha256': data_sha256, 'rows': int(len(labels)),
+                 'skipped_rows': int((~known).sum())},
+        'accuracy': round(float((predictions[:, :len(classes)].argmax(axis=1) == labels).mean()), 6),
+        'before': calibration_metrics(artifacts, predictions, labels, 1.0),
+        'after': calibration_metrics(artifacts, predictions, labels, temperature),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=DATA_PATH, help="Raw CSV, or cleaned Parquet file or directory")
+    parser.add_argument('--output', default=CALIBRATION_PATH, help="Where to write the calibration")
+    args = parser.parse_args()
+
+    calibration = calibrate(args.data)
+    tmp_path = f'{args.output}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as calibration_file:
+        json.dump(calibration, calibration_file, indent=2)
+    # Replace in one rename, so a running app never reads a half-written file
+    os.replace(tmp_path, args.output)
+
+    print(f"Temperature {calibration['temperature']:.4f} on {calibration['data']['rows']:,} rows "
+          f"(accuracy {calibration['accuracy']:.2%})")
+    for name in ('negative_log_likelihood', 'expected_calibration_error', 'mean_top_probability'):
+        print(f"  {name:28s} {calibration['before'][name]:.4f} -> {calibration['after'][name]:.4f}")
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
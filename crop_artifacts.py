@@ -0,0 +1,281 @@
+"""Lazy, once-per-process loading of the crop model, scaler and label encoder.
+
+Streamlit re-executes the app script on every interaction, but imported modules
+stay cached in sys.modules. Keeping the artifacts here means every rerun and
+every session in a server process shares one copy, and TensorFlow is only
+imported when the first prediction needs the model.
+
+The CROP_ENGINE environment variable picks the inference engine: "numpy" runs
+the exported weights in Intelligent_Crop_Selector.npz without TensorFlow,
+"keras" loads the SavedModel, and the default "auto" prefers NumPy whenever
+the exported weights exist. The quantized variants written by
+quantize_model.py are selected the same way: "numpy-float16", "numpy-int8",
+"tflite-float16" and "tflite-int8". Each variant records the SHA-256 of the
+exported weights it was made from, and is refused once the model is retrained.
+
+calibration.json, written by calibrate_model.py, holds an optional softmax
+temperature for the ranked probabilities of CropArtifacts.calibrate. It is
+used while Intelligent_Crop_Selector.npz is the file it was fitted on, with
+every engine: they all run that model, and variants made from another are
+refused.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from crop_metrics import timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'Intelligent_Crop_Selector')
+LABEL_ENCODER_PATH = os.path.join(BASE_DIR, 'label_encoder.pkl')
+SCALER_PATH = os.path.join(BASE_DIR, 'scaler.pkl')
+NUMPY_MODEL_PATH = os.path.join(BASE_DIR, 'Intelligent_Crop_Selector.npz')
+CALIBRATION_PATH = os.path.join(BASE_DIR, 'calibration.json')
+
+# Engines that run an exported model file instead of the SavedModel
+MODEL_VARIANTS = {
+    'numpy': NUMPY_MODEL_PATH,
+    'numpy-float16': os.path.join(BASE_DIR, 'Intelligent_Crop_Selector.float16.npz'),
+    'numpy-int8': os.path.join(BASE_DIR, 'Intelligent_Crop_Selector.int8.npz'),
+    'tflite-float16': os.path.join(BASE_DIR, 'Intelligent_Crop_Selector.float16.tflite'),
+    'tflite-int8': os.path.join(BASE_DIR, 'Intelligent_Crop_Selector.int8.tflite'),
+}
+ENGINES = ('keras',) + tuple(MODEL_VARIANTS)
+
+
+class CropArtifacts:
+    """The loaded model, scaler and label encoder for one process."""
+
+    def __init__(self, model, scaler, label_encoder, engine='keras', temperature=1.0):
+        self.model = model
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+        self.engine = engine
+        self.temperature = temperature
+
+    @property
+    def n_classes(self):
+        if self.engine == 'keras':
+            return self.model.output_shape[-1]
+        return self.model.n_classes
+
+    def predict_proba(self, input_data, batch_size=8192):
+        """Scores raw, unscaled input features with the selected engine.
+        Args: np.ndarray of shape (n_rows, 7), batch size for Keras.
+        Returns: np.ndarray of shape (n_rows, n_classes).
+        """
+        if self.engine.startswith('numpy'):
+            # The scaler is folded into the first layer of the NumPy model
+            with timed('model_predict'):
+                return self.model.predict(input_data)
+        with timed('scaler_transform'):
+            input_data_scaled = self.scaler.transform(input_data)
+        with timed('model_predict'):
+            if self.engine == 'keras':
+                return self.model.predict(input_data_scaled, batch_size=batch_size, verbose=0)
+            return self.model.predict(input_data_scaled)
+
+    def calibrate(self, predictions, temperature=None):
+        """Turns model output into calibrated probabilities over the known crops.
+        The model has more outputs than the label encoder has classes; the extra outputs
+        are dropped and each row renormalized before temperature scaling.
+        Args: np.ndarray of shape (n_rows, n_classes), temperature (default: the fitted one).
+        Returns: np.ndarray of shape (n_rows, len(label_encoder)) whose rows sum to 1.
+        """
+        temperature = self.temperature if temperature is None else temperature
+        probabilities = np.asarray(predictions, dtype=np.float64)[:, :len(self.label_encoder)]
+        if temperature != 1.0:
+            # Softmax outputs are logits up to a per-row constant, which the softmax below cancels
+            logits = np.log(np.maximum(probabilities, 1e-30)) / temperature
+            probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+
+def model_sha256(path=NUMPY_MODEL_PATH):
+    """Returns the SHA-256 of the exported weights, which identify the model a calibration belongs to."""
+    with open(path, 'rb') as model_file:
+        return hashlib.sha256(model_file.read()).hexdigest()
+
+
+def variant_source_path(path):
+    """Returns the sidecar file that records which model a TFLite variant was converted from."""
+    return f'{path}.source.json'
+
+
+def variant_source_sha256(engine):
+    """Returns the SHA-256 of the exported weights a quantized variant was made from, or None if unrecorded."""
+    path = MODEL_VARIANTS[engine]
+    try:
+        if engine.startswith('numpy'):
+            with np.load(path) as weights:
+                return str(weights['source_sha256']) if 'source_sha256' in weights.files else None
+        with open(variant_source_path(path)) as source_file:
+            return json.load(source_file)['source_sha256']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def check_variant(engine):
+    """Raises ValueError when a quantized variant was not made from the current model."""
+    if engine in ('keras', 'numpy'):
+        return
+    if variant_source_sha256(engine) != model_sha256():
+        # Stale variants, e.g. after train_model.py --install, would silently return another model's crops
+        raise ValueError(f"{os.path.basename(MODEL_VARIANTS[engine])} was not made from the current model; "
+                         f"rerun quantize_model.py")
+
+
+def load_temperature(path=CALIBRATION_PATH):
+    """Returns the fitted softmax temperature, or 1.0 when there is none for the current model."""
+    try:
+        with open(path) as calibration_file:
+            calibration = json.load(calibration_file)
+        # A calibration fitted for other weights, e.g. before retraining, does not apply
+        if calibration.get('model_sha256') != model_sha256():
+            return 1.0
+        return float(calibration['temperature'])
+    except (OSError, ValueError, KeyError):
+        return 1.0
+
+
+_lock = threading.Lock()
+_artifacts = None
+_timings = {'cold_start': None, 'warm_start': None, 'warm_calls': 0}
+
+
+def load_artifacts():
+    """Returns the shared artifacts, loading them on the first call.
+    Returns: CropArtifacts instance shared by every caller in the process.
+    """
+    global _artifacts
+    start = time.perf_counter()
+    if _artifacts is not None:
+        # Warm start: the artifacts are already in memory
+        _timings['warm_start'] = time.perf_counter() - start
+        _timings['warm_calls'] += 1
+        return _artifacts
+
+    with _lock:
+        # Another thread may have finished loading while we waited
+        if _artifacts is None:
+            _artifacts = _cold_load(start)
+    return _artifacts
+
+
+def import_keras():
+    """Returns the Keras 2 API that the SavedModel artifacts are written and read with.
+    From TensorFlow 2.16, tf.keras is Keras 3, which can neither save nor load SavedModel
+    directories; the tf_keras package keeps Keras 2 there. Older TensorFlow ships it as tf.keras.
+    """
+    try:
+        import tf_keras as keras
+    except ImportError:
+        from tensorflow import keras
+    return keras
+
+
+def selected_engine():
+    """Returns the inference engine named by CROP_ENGINE, resolving "auto"."""
+    engine = os.environ.get('CROP_ENGINE', 'auto').lower()
+    if engine == 'auto':
+        return 'numpy' if os.path.exists(NUMPY_MODEL_PATH) else 'keras'
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CROP_ENGINE: {engine}")
+    return engine
+
+
+@timed('artifact_load')
+def _cold_load(start):
+    cold_start = {}
+    engine = selected_engine()
+    check_variant(engine)
+
+    if engine.startswith('numpy'):
+        from numpy_inference import NumpyCropModel
+
+        # Load the exported weights, no TensorFlow needed
+        step = time.perf_counter()
+        model = NumpyCropModel.load(MODEL_VARIANTS[engine])
+        cold_start['model'] = time.perf_counter() - step
+    elif engine.startswith('tflite'):
+        from tflite_inference import TFLiteCropModel
+
+        # Load the quantized model into a TFLite interpreter
+        step = time.perf_counter()
+        model = TFLiteCropModel(MODEL_VARIANTS[engine])
+        cold_start['model'] = time.perf_counter() - step
+    else:
+        # Import TensorFlow only now, so the first page paint does not wait for it
+        step = time.perf_counter()
+        keras = import_keras()
+        cold_start['tensorflow_import'] = time.perf_counter() - step
+
+        # Load the model in Keras format
+        step = time.perf_counter()
+        model = keras.models.load_model(MODEL_PATH)
+        cold_start['model'] = time.perf_counter() - step
+
+    # Load the pickled label encoder for one-hot decoding
+    step = time.perf_counter()
+    with open(LABEL_ENCODER_PATH, 'rb') as label_encoder_file:
+        label_encoder = pickle.load(label_encoder_file)
+    cold_start['label_encoder'] = time.perf_counter() - step
+
+    # Load the scaler for standardizing input features
+    step = time.perf_counter()
+    with open(SCALER_PATH, 'rb') as scaler_file:
+        scaler = pickle.load(scaler_file)
+    cold_start['scaler'] = time.perf_counter() - step
+
+    temperature = load_temperature()
+
+    cold_start['total'] = time.perf_counter() - start
+    cold_start['engine'] = engine
+    _timings['cold_start'] = cold_start
+    return CropArtifacts(model, scaler, label_encoder, engine, temperature)
+
+
+def reload_artifacts():
+    """Drops the shared artifacts so the next load_artifacts call reads them from disk again."""
+    global _artifacts
+    with _lock:
+        _artifacts = None
+
+
+def artifact_fingerprint():
+    """Returns the size and modification time of every artifact file on disk.
+    Returns: tuple that changes whenever the model, weights, scaler, encoder or calibration change.
+    """
+    paths = [SCALER_PATH, LABEL_ENCODER_PATH, CALIBRATION_PATH, *MODEL_VARIANTS.values(),
+             *(variant_source_path(MODEL_VARIANTS[engine]) for engine in MODEL_VARIANTS if engine.startswith('tflite'))]
+    for root, _, files in os.walk(MODEL_PATH):
+        paths.extend(os.path.join(root, name) for name in files)
+
+    fingerprint = []
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def is_loaded():
+    """Returns True once the artifacts have been loaded in this process."""
+    return _artifacts is not None
+
+
+def load_timings():
+    """Returns the cold-start breakdown and the latest warm-start time in seconds.
+    Returns: dict with 'cold_start' (dict or None), 'warm_start' and 'warm_calls'.
+    """
+    timings = dict(_timings)
+    if timings['cold_start'] is not None:
+        timings['cold_start'] = dict(timings['cold_start'])
+    return timings
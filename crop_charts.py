@@ -0,0 +1,263 @@
+"""Figure builders for the dashboard pages that stay fast as the data grows.
+
+The builders are plain functions of a data frame, so pages can run them in
+the shared FigureCache thread pool and benchmarks can call them directly.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import seaborn as sns
+from matplotlib.figure import Figure
+from plotly.subplots import make_subplots
+
+from crop_metrics import timed
+
+# Default number of points drawn in the pair plot across all labels
+PAIR_PLOT_POINT_BUDGET = 2000
+
+# Default number of points drawn per line chart trace
+LINE_CHART_POINTS = 1000
+
+# Traces of the temperature, humidity and rainfall line chart: (column, name, color)
+LINE_CHART_TRACES = [('temperature_f', 'Temperature', 'red'), ('humidity', 'Humidity', 'blue'),
+                     ('rainfall_mm', 'Rainfall', 'green')]
+
+
+def _build_pie(labels, values, title):
+    fig = make_subplots(rows=1, cols=3, specs=[[{'type': 'domain'}, {'type': 'domain'}, {'type': 'domain'}]])
+    fig.add_trace(go.Pie(labels=labels, values=values, hole=0,
+                         marker=dict(colors=['red', 'blue', 'green'])), 1, 1)
+    fig.update_layout(title_text=title)
+    return fig
+
+
+@timed('figure.npk_pie')
+def build_npk_pie(avg_npk_values, plant):
+    """Builds the nitrogen, phosphorus and potassium pie chart from average values."""
+    values_npk = [avg_npk_values['nitrogen_pmm'], avg_npk_values['phosphorus_pmm'], avg_npk_values['potassium_mm']]
+    return _build_pie(['Nitrogen(N)', 'Phosphorous(P)', 'Potash(K)'], values_npk,
+                      f"Nitrogen, Phosphorus and Potassium Chart for {plant}")
+
+
+@timed('figure.thr_pie')
+def build_thr_pie(avg_thr_values, plant):
+    """Builds the temperature, humidity and rainfall pie chart from average values."""
+    values_thr = [avg_thr_values['temperature_f'], avg_thr_values['humidity'], avg_thr_values['rainfall_mm']]
+    return _build_pie(['Temperature', 'Humidity', 'Rainfall'], values_thr,
+                      f"Temperature, Humidity and Rainfall Chart for {plant}")
+
+
+@timed('figure.correlation_heatmap')
+def build_correlation_heatmap(correlation_matrix, plant):
+    """Plots a correlation matrix as an annotated heatmap.
+    Returns: matplotlib Figure, created without pyplot so it is safe to build off the main thread.
+    """
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5, ax=ax)
+    ax.set_title(f"Correlation Matrix for {plant}")
+    return fig
+
+
+def figure_png(fig, dpi=100):
+    """Renders a matplotlib Figure to PNG bytes, which sessions can share without touching the Figure."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """Builds figures in a shared thread pool and memoizes them per key.
+
+    Pages submit every figure they are about to show, then wait on each in
+    display order, so independent figures build concurrently and a repeated
+    selection costs a dictionary lookup. Cached figures are shared by every
+    session: render them, never modify them.
+    """
+
+    def __init__(self, max_workers=None, maxsize=128):
+        self.maxsize = maxsize
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or min(8, (os.cpu_count() or 1) + 2),
+                                            thread_name_prefix='figure')
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, build):
+        """Starts building a figure unless one is cached or in progress for the key.
+        Args: hashable key naming the figure and everything it depends on, zero-argument builder.
+        Returns: concurrent.futures.Future of the figure.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+                return future
+            future = self._executor.submit(build)
+            self._futures[key] = future
+            while len(self._futures) > self.maxsize:
+                self._futures.popitem(last=False)
+        future.add_done_callback(lambda done: self._forget_failed(key, done))
+        return future
+
+    def _forget_failed(self, key, future):
+        # Keep errors out of the cache, so the next rerun tries again
+        if future.exception() is not None:
+            with self._lock:
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+
+    def clear(self):
+        with self._lock:
+            self._futures.clear()
+
+
+figure_cache = FigureCache()
+
+
+def stratified_sample(data, budget, label_column='label', seed=0):
+    """Downsamples rows to a point budget while keeping every label represented.
+    Args: pd.DataFrame, maximum number of rows, label column, random seed.
+    Returns: pd.DataFrame with at most about budget rows, sampled proportionally per label,
+    and at least one row for every label.
+    """
+    if len(data) <= budget:
+        return data
+
+    # Each label gets a share of the budget proportional to its size
+    label_counts = data[label_column].value_counts()
+    quotas = np.maximum(1, np.floor(budget * label_counts / len(data))).astype(int)
+
+    # Shuffle once, then keep the first quota rows of every label
+    rng = np.random.default_rng(seed)
+    shuffled = data.iloc[rng.permutation(len(data))]
+    rank = shuffled.groupby(label_column, observed=True).cumcount().to_numpy()
+    quota = shuffled[label_column].map(quotas).to_numpy(dtype=int)
+    return shuffled[rank < quota].sort_index()
+
+
+@timed('figure.pair_plot')
+def build_pair_plot(data, features, title, point_budget=PAIR_PLOT_POINT_BUDGET, label_column='label'):
+    """Builds a WebGL scatter-matrix pair plot from a stratified sample of the rows.
+    Args: pd.DataFrame, feature columns to plot, figure title, maximum points, label column.
+    Returns: plotly go.Figure with one Splom trace per label.
+    """
+    sample = stratified_sample(data, point_budget, label_column)
+    palette = px.colors.qualitative.Alphabet
+
+    fig = go.Figure()
+    labels = pd.unique(sample[label_column])
+    for i, label in enumerate(sorted(labels, key=str)):
+        rows = sample[sample[label_column] == label]
+        fig.add_trace(go.Splom(
+            dimensions=[dict(label=feature, values=rows[feature].to_numpy()) for feature in features],
+            name=str(label),
+            marker=dict(color=palette[i % len(palette)], size=3, opacity=0.6),
+            diagonal_visible=False,
+            showupperhalf=False,
+        ))
+
+    fig.update_layout(
+        title=f"{title} ({len(sample):,} of {len(data):,} points)",
+        height=800,
+        dragmode='select',
+        hovermode='closest',
+    )
+    return fig
+
+
+def _bucket_bounds(n, n_buckets):
+    # Bucket i covers rows [bounds[i], bounds[i + 1])
+    return np.linspace(0, n, n_buckets + 1).astype(int)
+
+
+def minmax_downsample(x, y, n_out):
+    """Keeps the minimum and maximum of each bucket, so spikes survive downsampling.
+    Args: x and y arrays of equal length, target number of points.
+    Returns: tuple of (x, y) arrays with at most n_out points, in x order.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 2:
+        return x, y
+
+    # Pad the series to equal-sized buckets so min and max are one reshape away
+    n_buckets = n_out // 2
+    bucket_size = -(-n // n_buckets)
+    padded = np.full(n_buckets * bucket_size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, bucket_size)
+    valid = ~np.all(np.isnan(buckets), axis=1)
+    offsets = np.arange(n_buckets)[valid] * bucket_size
+
+    filled = np.where(np.isnan(buckets[valid]), np.inf, buckets[valid])
+    min_index = offsets + filled.argmin(axis=1)
+    filled = np.where(np.isnan(buckets[valid]), -np.inf, buckets[valid])
+    max_index = offsets + filled.argmax(axis=1)
+
+    index = np.unique(np.concatenate([min_index, max_index]))
+    return x[index], y[index]
+
+
+def lttb_downsample(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling, which preserves the visual shape of a series.
+    Args: x and y arrays of equal length with x increasing, target number of points.
+    Returns: tuple of (x, y) arrays with n_out points, keeping the first and last point.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return x, y
+
+    x_values = x.astype(np.float64)
+    # Inner points are split into n_out - 2 buckets; the end points are always kept
+    bounds = _bucket_bounds(n - 2, n_out - 2) + 1
+    bucket_sums_x = np.add.reduceat(x_values[1:-1], bounds[:-1] - 1)
+    bucket_sums_y = np.add.reduceat(y[1:-1], bounds[:-1] - 1)
+    bucket_sizes = np.diff(bounds)
+    # Average point of every bucket, plus the last point as the final "next bucket"
+    average_x = np.append(bucket_sums_x / bucket_sizes, x_values[-1])
+    average_y = np.append(bucket_sums_y / bucket_sizes, y[-1])
+
+    index = np.empty(n_out, dtype=np.int64)
+    index[0], index[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = bounds[i], bounds[i + 1]
+        # Twice the area of the triangle (previous point, candidate, next bucket average) for every candidate
+        area = np.abs((x_values[previous] - average_x[i + 1]) * (y[start:stop] - y[previous])
+                      - (x_values[previous] - x_values[start:stop]) * (average_y[i + 1] - y[previous]))
+        previous = start + int(area.argmax())
+        index[i + 1] = previous
+    return x[index], y[index]
+
+
+DOWNSAMPLERS = {'lttb': lttb_downsample, 'minmax': minmax_downsample}
+
+
+@timed('figure.line_chart')
+def build_line_chart(data, title, n_points=LINE_CHART_POINTS, x_range=None, method='lttb'):
+    """Builds the temperature, humidity and rainfall line chart with downsampled traces.
+    Args: pd.DataFrame indexed like the cleaned data, figure title, target points per trace,
+    optional (start, end) index range to refine into, downsampling method ('lttb' or 'minmax').
+    Returns: plotly go.Figure whose size does not grow with the number of rows.
+    """
+    if x_range is not None:
+        data = data.loc[(data.index >= x_range[0]) & (data.index <= x_range[1])]
+    downsample = DOWNSAMPLERS[method]
+    x = data.index.to_numpy()
+
+    fig = go.Figure()
+    for column, name, color in LINE_CHART_TRACES:
+        # Adding traces for Temperature, Humidity, and Rainfall
+        trace_x, trace_y = downsample(x, data[column].to_numpy(), n_points)
+        fig.add_trace(go.Scatter(x=trace_x, y=trace_y, mode='lines', name=name, line=dict(color=color)))
+
+    fig.update_layout(title=title, xaxis_title="Index", yaxis_title="Values")
+    return fig
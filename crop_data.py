@@ -0,0 +1,276 @@
+"""Shared, cached loading of the cleaned crop dataset for the dashboard pages.
+
+The cleaned frame is built once per process and reused by every page and
+session. It is also written to a Parquet file under data/.cache, keyed on the
+source CSV's modification time and SHA-256, so a new process reads compact
+columns instead of parsing and cleaning the CSV again.
+
+Across processes, every cleaned feature column (in its compact int16 or
+float32 dtype), the label codes and the row index are also published once as
+.npy files next to the Parquet cache. Every Streamlit worker memory-maps them
+read-only and wraps them in a DataFrame without copying, so the operating system keeps a single
+copy in the page cache however many workers run. CROP_SHARED_DATA=0 turns
+this off and gives each process its own compact frame, with the same dtypes.
+
+Callers share one frame: filter or copy it, never modify it in place. With
+shared data the arrays are read-only and in-place writes raise ValueError.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from crop_metrics import timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, 'data', '304_dataset.csv')
+CACHE_DIR = os.path.join(BASE_DIR, 'data', '.cache')
+
+# Bump when clean_crop_data or compact_dtypes change, so stale caches are ignored
+CACHE_VERSION = 1
+
+SHARED_DATA = os.environ.get('CROP_SHARED_DATA', '1').lower() not in ('', '0', 'false', 'no')
+
+# Numeric feature columns of the cleaned data, in model input order
+FEATURES = ['nitrogen_pmm', 'phosphorus_pmm', 'potassium_mm', 'temperature_f', 'humidity', 'soil_ph', 'rainfall_mm']
+
+# Plant Category Code
+plants = ['Carrots', 'onions', 'pomegranate', 'rice', 'greengram', 'lentil', 'mango', 'chickpea', 'coffee', 'papaya',
+          'pigeonpeas', 'apple', 'maize', 'banana', 'kidneybeans', 'coconut', 'grapes', 'cotton',
+          'lettuce', 'tomato', 'Cabbage', 'watermelon', 'orange']
+
+# Define categories and corresponding plants
+categories = {
+    "vegetables": ["Carrots", "onions", "lettuce", "tomato", "Cabbage"],
+    "cereals": ["rice", "maize"],
+    "fruits": ["pomegranate", "mango", "apple", "papaya", "banana", "grapes", "orange"],
+    "legumes": ["greengram", "lentil", "chickpea", "pigeonpeas", "kidneybeans", "mungbean"],
+    "others": ["coffee", "coconut", "cotton"]
+}
+
+# Classify plants into categories
+classified_plants = {category: [plant for plant in plants if plant in plant_list] for category, plant_list in categories.items()}
+
+
+def normalize_column_names(columns):
+    """Turns raw CSV headers like 'Nitrogen(pmm)' into column names like 'nitrogen_pmm'."""
+    # remove brackets
+    columns = [col.lower().strip().replace('(', ' ').replace(')', '') for col in columns]
+
+    # replace whitespace with underscores
+    return [col.replace(' ', "_") for col in columns]
+
+
+@timed('clean_crop_data')
+def clean_crop_data(df):
+    """Cleans and prepares crop data for analysis.
+    Args: pd.DataFrame crop data to be cleaned.
+    Returns: The cleaned crop data.
+    """
+    # Clean column names
+    df.columns = normalize_column_names(df.columns)
+    # Drop null values
+    df.dropna(inplace=True)
+
+    # Round specified columns to 4 decimal places
+    for col in ['temperature_f', 'humidity', 'soil_ph', 'rainfall_mm']:
+        df[col] = df[col].round(4)
+
+    # Drop duplicates
+    df.drop_duplicates(inplace=True)
+
+    # Drop records with label "mungbean"
+    df = df.query('label != "mungbean"')
+    return df
+
+
+def compact_dtypes(df):
+    """Shrinks cleaned crop data to compact column types.
+    Args: pd.DataFrame returned by clean_crop_data.
+    Returns: copy with a categorical label, int16 integer-valued features and float32 otherwise.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col == 'label':
+            df[col] = df[col].astype('category')
+            continue
+        values = df[col].to_numpy()
+        int16 = np.iinfo(np.int16)
+        if len(values) and np.all(np.mod(values, 1) == 0) and values.min() >= int16.min and values.max() <= int16.max:
+            df[col] = df[col].astype(np.int16)
+        else:
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _source_hash(path, stat):
+    # Reuse the recorded hash while the file's mtime and size are unchanged
+    meta_path = os.path.join(CACHE_DIR, os.path.basename(path) + '.json')
+    try:
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+        if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+            return meta['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha256 = file_sha256(path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(meta_path, 'w') as meta_file:
+            json.dump({'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha256}, meta_file)
+    except OSError:
+        pass
+    return sha256
+
+
+def cache_path(path, sha256):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f'{stem}-v{CACHE_VERSION}-{sha256[:16]}.parquet')
+
+
+def _read_cache(columnar_path):
+    try:
+        return pd.read_parquet(columnar_path)
+    except (ImportError, OSError, ValueError):
+        # No Parquet engine installed, or a missing or unreadable cache file
+        return None
+
+
+def _write_cache(df, columnar_path):
+    tmp_path = f'{columnar_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(tmp_path, index=True)
+        # Rename atomically so concurrent processes never read a partial file
+        os.replace(tmp_path, columnar_path)
+    except (ImportError, OSError, ValueError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def shared_paths(path, sha256):
+    """Returns the .npy paths of the shared arrays and the path of their metadata file."""
+    stem = os.path.splitext(cache_path(path, sha256))[0]
+    names = [f'feature-{feature}' for feature in FEATURES] + ['labels', 'index']
+    return {name: f'{stem}.{name}.npy' for name in names}, f'{stem}.shared.json'
+
+
+def publish_shared(crop_data, path, sha256):
+    """Writes the cleaned features, label codes and row index as .npy files for memory mapping.
+    Args: cleaned pd.DataFrame, source CSV path, its SHA-256.
+    """
+    array_paths, meta_path = shared_paths(path, sha256)
+    labels = crop_data['label'].astype('category')
+    # One contiguous array per column, in the column's own compact dtype, that a DataFrame can wrap as is
+    arrays = {f'feature-{feature}': np.ascontiguousarray(crop_data[feature].to_numpy()) for feature in FEATURES}
+    arrays['labels'] = labels.cat.codes.to_numpy()
+    arrays['index'] = crop_data.index.to_numpy(dtype=np.int64)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        for name, array in arrays.items():
+            tmp_path = f'{array_paths[name]}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as array_file:
+                np.save(array_file, array)
+            os.replace(tmp_path, array_paths[name])
+        # The metadata goes last, so readers never see a partly written set of arrays
+        tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as meta_file:
+            json.dump({'features': FEATURES, 'dtypes': [str(crop_data[feature].dtype) for feature in FEATURES],
+                       'categories': [str(c) for c in labels.cat.categories], 'rows': len(crop_data)}, meta_file)
+        os.replace(tmp_path, meta_path)
+    except OSError:
+        pass
+
+
+def attach_shared(path, sha256):
+    """Memory-maps the published arrays read-only and wraps them without copying.
+    Returns: pd.DataFrame laid out like the cleaned data, or None if nothing usable is published.
+    """
+    array_paths, meta_path = shared_paths(path, sha256)
+    try:
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+        arrays = {name: np.load(array_path, mmap_mode='r') for name, array_path in array_paths.items()}
+    except (OSError, ValueError):
+        return None
+    # Arrays published before per-column dtypes were recorded are republished
+    if meta['features'] != FEATURES or 'dtypes' not in meta or any(
+            len(array) != meta['rows'] for array in arrays.values()):
+        return None
+
+    columns = {feature: arrays[f'feature-{feature}'] for feature in FEATURES}
+    columns['label'] = pd.Categorical.from_codes(arrays['labels'], categories=meta['categories'])
+    return pd.DataFrame(columns, index=pd.Index(arrays['index'], copy=False), copy=False)
+
+
+_lock = threading.Lock()
+_loaded = {}
+load_info = {}
+
+
+def load_crop_data(path=DATA_PATH):
+    """Returns the cleaned crop data, loading it at most once per process.
+    Args: path of the source CSV.
+    Returns: pd.DataFrame shared by all callers; do not modify it in place.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    crop_data = _loaded.get(key)
+    if crop_data is not None:
+        return crop_data
+
+    with _lock:
+        crop_data = _loaded.get(key)
+        if crop_data is not None:
+            return crop_data
+
+        start = time.perf_counter()
+        sha256 = _source_hash(path, stat)
+        crop_data = None
+        if SHARED_DATA:
+            with timed('shared_attach'):
+                crop_data = attach_shared(path, sha256)
+            source = 'shared'
+        if crop_data is None:
+            columnar_path = cache_path(path, sha256)
+            with timed('parquet_load'):
+                crop_data = _read_cache(columnar_path)
+            source = 'parquet'
+            if crop_data is None:
+                with timed('csv_load'):
+                    raw_data = pd.read_csv(path)
+                crop_data = compact_dtypes(clean_crop_data(raw_data))
+                _write_cache(crop_data, columnar_path)
+                source = 'csv'
+            if SHARED_DATA:
+                # Publish for the other processes, then use the mapped copy here too
+                publish_shared(crop_data, path, sha256)
+                shared_data = attach_shared(path, sha256)
+                if shared_data is not None:
+                    crop_data, source = shared_data, f'{source}+shared'
+
+        # Keep only the current version of the file in memory
+        _loaded.clear()
+        _loaded[key] = crop_data
+        load_info.update({
+            'path': path,
+            'sha256': sha256,
+            'source': source,
+            'rows': len(crop_data),
+            'seconds': time.perf_counter() - start,
+            'memory_bytes': int(crop_data.memory_usage(deep=True).sum()),
+        })
+    return crop_data
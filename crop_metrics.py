@@ -0,0 +1,237 @@
+"""Lightweight in-process timing and counters for the predictor and dashboards.
+
+Metrics are off unless CROP_METRICS=1. When off, timed() hands back a shared
+no-op object and decorated functions are returned unwrapped, so the hooks
+cost next to nothing. When on, every stage records a call count and a latency
+histogram, available as:
+    - Prometheus text at http://127.0.0.1:$CROP_METRICS_PORT/metrics
+    - JSON at http://127.0.0.1:$CROP_METRICS_PORT/metrics.json
+    - a debug panel in the Streamlit sidebar (render_metrics_sidebar)
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get('CROP_METRICS', '0').lower() not in ('', '0', 'false', 'no')
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket that contains it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """Thread-safe counters and per-stage latency histograms."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """Returns the counters and a per-stage summary as a JSON-friendly dict."""
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': histogram.count,
+                    'total_seconds': histogram.sum,
+                    'mean_seconds': histogram.sum / histogram.count if histogram.count else 0.0,
+                    'p50_seconds': histogram.quantile(0.5),
+                    'p99_seconds': histogram.quantile(0.99),
+                }
+                for stage, histogram in sorted(self.histograms.items())
+            }
+            return {'enabled': ENABLED, 'counters': dict(sorted(self.counters.items())), 'stages': stages}
+
+    def prometheus_text(self):
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = 'crop_' + name.replace('.', '_') + '_total'
+                lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+
+            lines.append('# TYPE crop_stage_duration_seconds histogram')
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'crop_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'crop_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'crop_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = MetricsRegistry()
+
+
+class _Timer:
+    """Times a block or a function and records it under a stage name."""
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, fn):
+        stage = self.stage
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                registry.observe(stage, time.perf_counter() - start)
+        return wrapper
+
+
+class _NullTimer:
+    """Stand-in for _Timer when metrics are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __call__(self, fn):
+        return fn
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(stage):
+    """Context manager or decorator that records the latency of a stage.
+    Usage: `with timed('model_predict'): ...` or `@timed('clean_crop_data')`.
+    """
+    return _Timer(stage) if ENABLED else _NULL_TIMER
+
+
+def count(name, amount=1):
+    """Increments a counter when metrics are enabled."""
+    if ENABLED:
+        registry.inc(name, amount)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = registry.prometheus_text().encode(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(registry.snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep scrapes out of the app's console output
+        pass
+
+
+_server_lock = threading.Lock()
+_server = None
+
+
+def start_metrics_server(port=None, host='127.0.0.1'):
+    """Serves the metrics locally from a daemon thread, once per process.
+    Args: port (defaults to CROP_METRICS_PORT; nothing is started without one), host.
+    Returns: the running server, or None when metrics are disabled or no port is set.
+    """
+    global _server
+    port = port or os.environ.get('CROP_METRICS_PORT')
+    if not ENABLED or not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except OSError:
+                # Another worker in this process group already serves on the port
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+def render_metrics_sidebar():
+    """Shows the collected metrics in a Streamlit sidebar expander when metrics are enabled."""
+    if not ENABLED:
+        return
+    import streamlit as st
+
+    start_metrics_server()
+    snapshot = registry.snapshot()
+    with st.sidebar.expander("Debug: Metrics"):
+        if snapshot['stages']:
+            st.dataframe({
+                'stage': list(snapshot['stages']),
+                'calls': [stage['count'] for stage in snapshot['stages'].values()],
+                'mean ms': [round(stage['mean_seconds'] * 1000, 3) for stage in snapshot['stages'].values()],
+                'p99 ms (bucket)': [stage['p99_seconds'] * 1000 for stage in snapshot['stages'].values()],
+            })
+        for name, value in snapshot['counters'].items():
+            st.text(f"{name}: {value:,}")
@@ -0,0 +1,271 @@
+"""Materialized per-crop and per-category summary statistics.
+
+CropSummaryCube holds count, mean, min, max and a few quantiles of every
+feature for each label, each category in crop_data.categories and "All". The
+tables are computed once when the data loads and refreshed only for the
+groups touched when rows are appended, so the dashboards look statistics up
+instead of scanning the frame on every interaction.
+
+Each label also keeps FeatureMoments (count, mean vector and co-moment
+matrix), which merge exactly, so the correlation matrix of any label,
+category or "All" is assembled from per-label moments without rescanning rows.
+Quantiles come from one KLLSketch per label and feature, merged per group, so
+no feature values are kept and refreshing a group costs O(k) per label; they
+are approximate, within about 1% in rank.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from crop_data import DATA_PATH, FEATURES, categories, load_crop_data
+from quantile_sketch import KLLSketch
+
+# Quantiles materialized for every group
+QUANTILES = (0.25, 0.5, 0.75)
+
+# Name of the group covering every label
+ALL = 'All'
+
+# Rows folded in per step, so appending a large frame only ever converts a small slice to float64
+APPEND_CHUNK_ROWS = 65536
+
+
+class FeatureMoments:
+    """Count, mean and co-moment matrix of a set of feature vectors.
+
+    The co-moment matrix is the sum of outer products of deviations from the
+    mean. Batches are folded in with the pairwise update of Chan et al., which
+    stays numerically stable where raw sums of cross-products would not.
+    """
+
+    def __init__(self, n_features):
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.comoment = np.zeros((n_features, n_features))
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        moments = cls(values.shape[1])
+        moments.update(values)
+        return moments
+
+    def update(self, values):
+        """Folds a batch of rows of shape (n_rows, n_features) into the moments."""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        batch = FeatureMoments(values.shape[1])
+        batch.count = len(values)
+        batch.mean = values.mean(axis=0)
+        deviations = values - batch.mean
+        batch.comoment = deviations.T @ deviations
+        self.merge(batch)
+
+    def merge(self, other):
+        """Merges another FeatureMoments into this one in place."""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.comoment = other.comoment.copy()
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.count * other.count / count)
+        self.mean = self.mean + delta * (other.count / count)
+        self.count = count
+
+    def covariance(self):
+        if self.count < 2:
+            return np.full(self.comoment.shape, np.nan)
+        return self.comoment / (self.count - 1)
+
+    def correlation(self):
+        """Returns the Pearson correlation matrix, NaN where a feature is constant."""
+        covariance = self.covariance()
+        std = np.sqrt(np.diag(covariance))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = covariance / np.outer(std, std)
+        return np.clip(correlation, -1.0, 1.0)
+
+
+class CropSummaryCube:
+    """Per-label and per-category feature statistics that can be appended to.
+
+    Group names share one namespace: a label, a category name or "All".
+    """
+
+    def __init__(self, categories=categories, features=FEATURES, quantiles=QUANTILES):
+        self.categories = categories
+        self.features = list(features)
+        self.quantiles = tuple(quantiles)
+        self.stat_names = ['count', 'mean', 'min', 'max'] + [f'p{round(q * 100)}' for q in self.quantiles]
+
+        # Running per-label aggregates
+        self._count = {}
+        self._sum = {}
+        self._min = {}
+        self._max = {}
+        # Per-label quantile sketches, one per feature, only kept when quantiles are requested
+        self._sketches = {}
+        # Per-label mergeable moments for covariance and correlation
+        self._moments = {}
+
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, crop_data, **kwargs):
+        """Builds a cube from a cleaned crop data frame."""
+        cube = cls(**kwargs)
+        cube.append(crop_data)
+        return cube
+
+    @property
+    def labels(self):
+        return sorted(self._count)
+
+    def append(self, rows):
+        """Adds cleaned rows and refreshes the tables of every group they touch.
+        Args: pd.DataFrame with a label column and the feature columns.
+        """
+        touched = set()
+        with self._lock:
+            for start in range(0, len(rows), APPEND_CHUNK_ROWS):
+                touched.update(self._fold(rows.iloc[start:start + APPEND_CHUNK_ROWS]))
+
+            if not touched:
+                return
+            # Only groups containing an appended label need to be rebuilt
+            groups = {label: [label] for label in touched}
+            for category, plant_list in self.categories.items():
+                if touched.intersection(plant_list):
+                    groups[category] = plant_list
+            groups[ALL] = list(self._count)
+            for name, labels in groups.items():
+                self._tables[name] = self._materialize(labels)
+
+    def _fold(self, rows):
+        """Folds rows into the per-label aggregates and returns the labels they touched."""
+        touched = set()
+        for label, group in rows.groupby('label', observed=True, sort=False):
+            values = group[self.features].to_numpy(dtype=np.float64)
+            if not len(values):
+                continue
+            if label in self._count:
+                self._count[label] += len(values)
+                self._sum[label] += values.sum(axis=0)
+                np.minimum(self._min[label], values.min(axis=0), out=self._min[label])
+                np.maximum(self._max[label], values.max(axis=0), out=self._max[label])
+                self._moments[label].update(values)
+            else:
+                self._count[label] = len(values)
+                self._sum[label] = values.sum(axis=0)
+                self._min[label] = values.min(axis=0)
+                self._max[label] = values.max(axis=0)
+                if self.quantiles:
+                    # Fixed seeds, so the same rows always give the same quantiles
+                    self._sketches[label] = [KLLSketch(seed=i) for i in range(len(self.features))]
+                self._moments[label] = FeatureMoments.from_values(values)
+            if self.quantiles:
+                for sketch, column in zip(self._sketches[label], values.T):
+                    sketch.update(column)
+            touched.add(label)
+        return touched
+
+    def _materialize(self, labels):
+        labels = [label for label in labels if label in self._count]
+        if not labels:
+            return None
+
+        count = sum(self._count[label] for label in labels)
+        rows = {
+            'count': np.full(len(self.features), count, dtype=np.float64),
+            'mean': np.sum([self._sum[label] for label in labels], axis=0) / count,
+            'min': np.min([self._min[label] for label in labels], axis=0),
+            'max': np.max([self._max[label] for label in labels], axis=0),
+        }
+        if self.quantiles:
+            quantiles = np.empty((len(self.quantiles), len(self.features)))
+            for i in range(len(self.features)):
+                # Merge into a fresh sketch, leaving the per-label sketches untouched
+                sketch = KLLSketch(seed=i)
+                for label in labels:
+                    sketch.merge(self._sketches[label][i])
+                quantiles[:, i] = sketch.quantile(self.quantiles)
+            for name, q in zip(self.stat_names[4:], quantiles):
+                rows[name] = q
+        return pd.DataFrame(rows, index=self.features).T
+
+    def table(self, group=ALL):
+        """Returns the statistics of one group.
+        Args: a label, a category name or "All".
+        Returns: pd.DataFrame with one row per statistic and one column per feature,
+        or None if the group has no rows.
+        """
+        return self._tables.get(group)
+
+    def mean(self, group=ALL, features=None):
+        """Returns the feature means of one group as a pd.Series."""
+        table = self.table(group)
+        if table is None:
+            return None
+        means = table.loc['mean']
+        return means[features] if features is not None else means
+
+    def count(self, group=ALL):
+        table = self.table(group)
+        return 0 if table is None else int(table.iloc[0, 0])
+
+    def labels_in(self, group=ALL):
+        """Returns the labels with data that belong to a label, category or "All"."""
+        if group == ALL:
+            return self.labels
+        if group in self.categories:
+            return [label for label in self.categories[group] if label in self._count]
+        return [group] if group in self._count else []
+
+    def moments(self, group=ALL):
+        """Merges the per-label moments of a group, in O(#labels x features^2)."""
+        moments = FeatureMoments(len(self.features))
+        for label in self.labels_in(group):
+            moments.merge(self._moments[label])
+        return moments
+
+    def correlation(self, group=ALL, features=None):
+        """Returns the correlation matrix of a group without touching its rows.
+        Args: a label, a category name or "All", and optionally the features to include.
+        Returns: pd.DataFrame indexed and columned by feature, like DataFrame.corr().
+        """
+        correlation = pd.DataFrame(self.moments(group).correlation(), index=self.features, columns=self.features)
+        if features is not None:
+            correlation = correlation.loc[features, features]
+        return correlation
+
+    def means(self):
+        """Returns the per-label feature means, one row per label, like a pivot table of means."""
+        labels = self.labels
+        means = np.array([self._sum[label] / self._count[label] for label in labels]).reshape(len(labels), -1)
+        return pd.DataFrame(means, index=pd.Index(labels, name='label'), columns=self.features)
+
+
+_lock = threading.Lock()
+_cubes = {}
+
+
+def load_crop_summary(path=DATA_PATH):
+    """Returns the summary cube of the shared crop data, building it once per loaded frame."""
+    crop_data = load_crop_data(path)
+    cube = _cubes.get(path)
+    if cube is not None and cube[0] is crop_data:
+        return cube[1]
+
+    with _lock:
+        cube = _cubes.get(path)
+        if cube is None or cube[0] is not crop_data:
+            cube = (crop_data, CropSummaryCube.from_frame(crop_data))
+            _cubes[path] = cube
+    return cube[1]
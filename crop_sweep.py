@@ -0,0 +1,103 @@
+"""Vectorized what-if sweeps over one or two input features.
+
+Every other feature stays fixed while one or two vary over a range. The whole
+grid is scored with a single predict_crop_batch call, so a 200x200 sweep costs
+one forward pass over 40,000 rows instead of 40,000 button presses.
+"""
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+from Intelligent_Crop_Selector import predict_crop_batch, top_k_crops
+
+# Input labels as shown in the predictor, in model input order
+FEATURE_LABELS = ["Nitrogen (pmm)", "Phosphorus (pmm)", "Potassium (pmm)", "Temperature (°C)", "Humidity (%)",
+                  "Soil pH", "Rainfall (mm)"]
+
+
+class SweepResult:
+    """Grid of predictions from a what-if sweep."""
+
+    def __init__(self, x_feature, x_values, y_feature, y_values, crops, confidence, seconds):
+        self.x_feature = x_feature
+        self.x_values = x_values
+        self.y_feature = y_feature
+        self.y_values = y_values
+        # Shape (len(y_values), len(x_values)), or (len(x_values),) for a one-feature sweep
+        self.crops = crops
+        self.confidence = confidence
+        self.seconds = seconds
+
+    @property
+    def n_points(self):
+        return self.crops.size
+
+
+def sweep(base_features, x_feature, x_range, y_feature=None, y_range=None, steps=200):
+    """Scores a grid of inputs that differ from base_features in one or two features.
+    Args: seven base feature values in model input order, index and (low, high) range of the
+    first varied feature, optional index and range of a second one, grid points per feature.
+    Returns: SweepResult with the predicted crop and its probability at every grid point.
+    """
+    start = time.perf_counter()
+    base = np.asarray(base_features, dtype=float)
+    x_values = np.linspace(x_range[0], x_range[1], steps)
+
+    if y_feature is None:
+        grid = np.tile(base, (steps, 1))
+        grid[:, x_feature] = x_values
+        y_values = None
+        shape = (steps,)
+    else:
+        y_values = np.linspace(y_range[0], y_range[1], steps)
+        # Rows run over x fastest, so reshaping gives a (y, x) grid
+        grid = np.tile(base, (steps * steps, 1))
+        grid[:, x_feature] = np.tile(x_values, steps)
+        grid[:, y_feature] = np.repeat(y_values, steps)
+        shape = (steps, steps)
+
+    # One batched forward pass over the whole grid
+    predictions = predict_crop_batch(grid)
+    # Calibrated, like the probabilities shown next to a single prediction
+    crops, probabilities = top_k_crops(predictions, 1)
+    crops, confidence = crops[:, 0].reshape(shape), probabilities[:, 0].reshape(shape)
+    return SweepResult(x_feature, x_values, y_feature, y_values, crops, confidence, time.perf_counter() - start)
+
+
+def build_sweep_figure(result, palette):
+    """Plots a sweep as a crop-decision region map (two features) or strip (one feature).
+    Args: SweepResult, list of colors to cycle through for the crops.
+    Returns: plotly go.Figure.
+    """
+    crop_names, codes = np.unique(result.crops, return_inverse=True)
+    codes = codes.reshape(result.crops.shape)
+    n_crops = len(crop_names)
+
+    # Discrete colorscale: one flat band per crop present in the grid
+    colorscale = []
+    for i in range(n_crops):
+        color = palette[i % len(palette)]
+        colorscale += [[i / n_crops, color], [(i + 1) / n_crops, color]]
+    colorbar = dict(tickvals=np.arange(n_crops), ticktext=list(crop_names), title="Crop")
+
+    fig = go.Figure()
+    x_label = FEATURE_LABELS[result.x_feature]
+    if result.y_feature is None:
+        fig.add_trace(go.Heatmap(
+            z=codes[np.newaxis, :], x=result.x_values, y=["Crop"], zmin=-0.5, zmax=n_crops - 0.5,
+            colorscale=colorscale, colorbar=colorbar, customdata=result.crops[np.newaxis, :],
+            text=np.round(result.confidence[np.newaxis, :], 3),
+            hovertemplate=f"{x_label}: %{{x:.2f}}<br>Crop: %{{customdata}}<br>Probability: %{{text}}<extra></extra>"))
+        fig.update_layout(xaxis_title=x_label, height=300)
+    else:
+        y_label = FEATURE_LABELS[result.y_feature]
+        fig.add_trace(go.Heatmap(
+            z=codes, x=result.x_values, y=result.y_values, zmin=-0.5, zmax=n_crops - 0.5,
+            colorscale=colorscale, colorbar=colorbar, customdata=result.crops, text=np.round(result.confidence, 3),
+            hovertemplate=(f"{x_label}: %{{x:.2f}}<br>{y_label}: %{{y:.2f}}<br>Crop: %{{customdata}}"
+                           f"<br>Probability: %{{text}}<extra></extra>")))
+        fig.update_layout(xaxis_title=x_label, yaxis_title=y_label, height=600)
+
+    fig.update_layout(title=f"Recommended Crop over {result.n_points:,} What-if Inputs")
+    return fig
@@ -0,0 +1,82 @@
+"""Exports the Keras SavedModel and scaler to a compact NumPy weights file.
+
+Usage: python export_numpy_model.py [--check]
+
+--check compares the NumPy forward pass against the Keras model on every row
+of data/304_dataset.csv and exits non-zero if they disagree.
+"""
+import argparse
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+from crop_artifacts import BASE_DIR, MODEL_PATH, NUMPY_MODEL_PATH, SCALER_PATH, import_keras
+from numpy_inference import NumpyCropModel, fold_scaler
+
+DATA_PATH = os.path.join(BASE_DIR, 'data', '304_dataset.csv')
+
+
+def export_model(model, scaler, output_path=NUMPY_MODEL_PATH):
+    """Writes the dense layers of a Keras model, with the scaler folded in.
+    Args: Keras Sequential model of Dense layers, fitted StandardScaler, output path.
+    Returns: the exported NumpyCropModel.
+    """
+    kernels, biases, activations = [], [], []
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if not weights:
+            continue
+        kernel, bias = weights
+        kernels.append(kernel)
+        biases.append(bias)
+        activations.append(layer.activation.__name__)
+
+    kernels, biases = fold_scaler(kernels, biases, scaler.mean_, scaler.scale_)
+    numpy_model = NumpyCropModel(kernels, biases, activations)
+    numpy_model.save(output_path)
+    return numpy_model
+
+
+def check_parity(model, scaler, numpy_model, data_path=DATA_PATH):
+    """Compares Keras and NumPy predictions on every row of the dataset.
+    Returns: tuple of (max absolute probability difference, argmax agreement rate).
+    """
+    data = pd.read_csv(data_path)
+    input_data = data.iloc[:, :7].dropna().to_numpy(dtype=float)
+
+    keras_output = model.predict(scaler.transform(input_data), batch_size=8192, verbose=0)
+    numpy_output = numpy_model.predict(input_data)
+
+    max_difference = float(np.abs(keras_output - numpy_output).max())
+    agreement = float((keras_output.argmax(axis=1) == numpy_output.argmax(axis=1)).mean())
+    return max_difference, agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=NUMPY_MODEL_PATH, help="Where to write the .npz weights")
+    parser.add_argument('--check', action='store_true', help="Verify parity with Keras on the full dataset")
+    args = parser.parse_args()
+
+    model = import_keras().models.load_model(MODEL_PATH)
+    with open(SCALER_PATH, 'rb') as scaler_file:
+        scaler = pickle.load(scaler_file)
+
+    numpy_model = export_model(model, scaler, args.output)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+    if args.check:
+        max_difference, agreement = check_parity(model, scaler, numpy_model)
+        print(f"Max probability difference: {max_difference:.2e}")
+        print(f"Predicted class agreement: {agreement:.2%}")
+        if max_difference > 1e-4 or agreement < 1.0:
+            print("Parity check failed", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""Local HTTP/JSON inference service with dynamic micro-batching.
+
+Usage: python inference_server.py [--port 8502] [--max-batch-size 256] [--max-wait-ms 5]
+
+Endpoints:
+    POST /predict  {"nitrogen": 90, "phosphorus": 42, "potassium": 43, "temperature": 20.9,
+                    "humidity": 82, "soil_ph": 6.5, "rainfall": 202.9}
+                   or {"features": [90, 42, 43, 20.9, 82, 6.5, 202.9]}
+                   -> {"crop": "rice", "class_index": 20,
+                       "top_crops": [{"crop": "rice", "probability": 0.97}, ...]}
+    GET  /stats    latency percentiles and batch-size statistics
+    GET  /health   liveness check
+
+Concurrent requests are queued and scored together: a batch is flushed when it
+reaches the maximum batch size or when its oldest request has waited the
+maximum wait, whichever comes first. Each batch is one vectorized call to
+predict_crop_batch. top_crops ranks the --top-k most likely crops, with
+calibrated probabilities, from the same model output.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from crop_artifacts import load_artifacts
+from Intelligent_Crop_Selector import TOP_K, predict_crop_batch, predicted_classes, top_k_crops
+from prediction_log import prediction_log
+
+# Argument names of predict_crop, in model input order
+FEATURE_NAMES = ['nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'soil_ph', 'rainfall']
+
+# Number of recent requests and batches kept for the statistics
+STATS_WINDOW = 10000
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                500: 'Internal Server Error'}
+
+
+class ServerStats:
+    """Rolling latency and batch-size statistics."""
+
+    def __init__(self, window=STATS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.started = time.time()
+
+    def record_batch(self, batch_size):
+        self.batch_sizes.append(batch_size)
+        self.batches += 1
+
+    def record_request(self, latency):
+        self.latencies.append(latency)
+        self.requests += 1
+
+    def summary(self):
+        summary = {
+            'requests': self.requests,
+            'batches': self.batches,
+            'uptime_seconds': round(time.time() - self.started, 1),
+        }
+        if self.latencies:
+            latencies_ms = np.array(self.latencies) * 1000
+            summary['latency_ms'] = {
+                'p50': round(float(np.percentile(latencies_ms, 50)), 3),
+                'p99': round(float(np.percentile(latencies_ms, 99)), 3),
+                'max': round(float(latencies_ms.max()), 3),
+            }
+        if self.batch_sizes:
+            batch_sizes = np.array(self.batch_sizes)
+            summary['batch_size'] = {
+                'mean': round(float(batch_sizes.mean()), 2),
+                'p50': float(np.percentile(batch_sizes, 50)),
+                'p99': float(np.percentile(batch_sizes, 99)),
+                'max': int(batch_sizes.max()),
+            }
+        return summary
+
+
+class MicroBatcher:
+    """Collects single-row requests into batches for one vectorized model call."""
+
+    def __init__(self, stats, max_batch_size=256, max_wait_ms=5.0, top_k=TOP_K):
+        self.stats = stats
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.top_k = top_k
+        self.queue = asyncio.Queue()
+
+    async def predict(self, features):
+        """Queues one row of features and waits for its (crop, class index, top crops) result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((features, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Block until the first request of the next batch arrives
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            # Keep collecting until the batch is full or the oldest request has waited long enough
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.stats.record_batch(len(batch))
+            input_data = np.array([features for features, _ in batch], dtype=float)
+            try:
+                # Score off the event loop so new requests keep queueing meanwhile
+                predictions = await loop.run_in_executor(None, predict_crop_batch, input_data)
+                class_indices = predicted_classes(predictions)
+                crops = np.asarray(load_artifacts().label_encoder)[class_indices]
+                if self.top_k > 0:
+                    top_crops, top_probabilities = top_k_crops(predictions, self.top_k)
+                else:
+                    top_crops = top_probabilities = np.empty((len(batch), 0))
+                prediction_log.record_batch(input_data, class_indices)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), crop, class_index, ranked_crops, probabilities in zip(
+                    batch, crops, class_indices, top_crops, top_probabilities):
+                if not future.done():
+                    top = [{'crop': str(name), 'probability': round(float(probability), 4)}
+                           for name, probability in zip(ranked_crops, probabilities)]
+                    future.set_result((str(crop), int(class_index), top))
+
+
+def parse_features(payload):
+    """Reads the seven input features from a request body.
+    Args: dict decoded from the JSON body.
+    Returns: list of seven finite floats in model input order.
+    """
+    if 'features' in payload:
+        features = payload['features']
+        if len(features) != len(FEATURE_NAMES):
+            raise ValueError(f"Expected {len(FEATURE_NAMES)} features, got {len(features)}")
+    else:
+        missing = [name for name in FEATURE_NAMES if name not in payload]
+        if missing:
+            raise ValueError(f"Missing features: {', '.join(missing)}")
+        features = [payload[name] for name in FEATURE_NAMES]
+    features = [float(value) for value in features]
+    # float() accepts "nan" and "inf", which would make the response invalid JSON and skew the drift log
+    if not all(math.isfinite(value) for value in features):
+        raise ValueError("Features must be finite numbers")
+    return features
+
+
+class InferenceServer:
+    """Minimal HTTP/1.1 server in front of a MicroBatcher."""
+
+    def __init__(self, max_batch_size=256, max_wait_ms=5.0, top_k=TOP_K):
+        self.stats = ServerStats()
+        self.batcher = MicroBatcher(self.stats, max_batch_size, max_wait_ms, top_k)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            # Serve requests on the connection until the client closes it
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, response = await self.route(method, path, body)
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                self.write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.stats.summary()
+        if path != '/predict':
+            return 404, {'error': f"Unknown path: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST for /predict"}
+
+        start = time.perf_counter()
+        try:
+            features = parse_features(json.loads(body))
+        except (ValueError, TypeError, AttributeError) as e:
+            return 400, {'error': f"Invalid request: {e}"}
+        try:
+            crop, class_index, top_crops = await self.batcher.predict(features)
+        except Exception as e:
+            return 500, {'error': f"Error during prediction: {e}"}
+        self.stats.record_request(time.perf_counter() - start)
+        return 200, {'crop': crop, 'class_index': class_index, 'top_crops': top_crops}
+
+    @staticmethod
+    def write_response(writer, status, response, keep_alive):
+        body = json.dumps(response).encode()
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+
+    async def serve(self, host, port):
+        # Load the artifacts before accepting traffic so no request pays the cold start
+        load_artifacts()
+        batch_worker = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving crop predictions on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_worker.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--top-k', type=int, default=TOP_K, help="Ranked crops returned per prediction (0 for none)")
+    args = parser.parse_args()
+
+    server = InferenceServer(args.max_batch_size, args.max_wait_ms, args.top_k)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
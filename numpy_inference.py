@@ -0,0 +1,134 @@
+"""Pure-NumPy forward pass for the exported Intelligent_Crop_Selector network.
+
+The weights come from export_numpy_model.py, which folds the scaler's mean and
+scale into the first dense layer, so raw (unscaled) features go straight in.
+Nothing here imports TensorFlow.
+
+Kernels can be stored as float16, or as int8 with a float32 scale per input
+row and per output unit (quantize_model.py). They are expanded back to float32 on load, because
+NumPy has no fast float16 or int8 matrix product; quantization shrinks the
+file, not the matrix products.
+"""
+import numpy as np
+
+
+def relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def softmax(x):
+    # Subtract the row maximum for numerical stability
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+def linear(x):
+    return x
+
+
+ACTIVATIONS = {'relu': relu, 'softmax': softmax, 'linear': linear}
+
+
+class NumpyCropModel:
+    """Dense classifier evaluated with NumPy matrix products."""
+
+    def __init__(self, kernels, biases, activations):
+        self.kernels = [np.asarray(kernel, dtype=np.float32) for kernel in kernels]
+        self.biases = [np.asarray(bias, dtype=np.float32) for bias in biases]
+        self.activations = [str(activation) for activation in activations]
+        for activation in self.activations:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+
+    @classmethod
+    def load(cls, path):
+        """Loads a model written by export_numpy_model.py.
+        Args: path to the .npz file.
+        Returns: NumpyCropModel instance.
+        """
+        with np.load(path) as weights:
+            n_layers = len(weights['activations'])
+            kernels = [dequantize(weights[f'kernel_{i}'], weights.get(f'kernel_row_scale_{i}'),
+                                  weights.get(f'kernel_scale_{i}')) for i in range(n_layers)]
+            biases = [weights[f'bias_{i}'] for i in range(n_layers)]
+            activations = weights['activations']
+        return cls(kernels, biases, activations)
+
+    def save(self, path, weight_dtype='float32', source_sha256=None):
+        """Writes the weights to a compressed .npz file.
+        Args: output path, storage type of the kernels: 'float32', 'float16' or 'int8',
+            SHA-256 of the weights a quantized copy was made from, recorded in the file.
+        """
+        weights = {}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            if weight_dtype == 'int8':
+                weights[f'kernel_{i}'], weights[f'kernel_row_scale_{i}'], weights[f'kernel_scale_{i}'] = \
+                    quantize_int8(kernel)
+            elif weight_dtype in ('float32', 'float16'):
+                weights[f'kernel_{i}'] = kernel.astype(weight_dtype)
+            else:
+                raise ValueError(f"Unsupported weight dtype: {weight_dtype}")
+            weights[f'bias_{i}'] = bias
+        if source_sha256 is not None:
+            weights['source_sha256'] = np.array(source_sha256)
+        np.savez_compressed(path, activations=np.array(self.activations), **weights)
+
+    @property
+    def n_classes(self):
+        return self.kernels[-1].shape[1]
+
+    def predict(self, input_data):
+        """Runs the forward pass on raw, unscaled features.
+        Args: array-like of shape (n_rows, 7).
+        Returns: np.ndarray of shape (n_rows, n_classes) with class probabilities.
+        """
+        x = np.asarray(input_data, dtype=np.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = x @ kernel
+            x += bias
+            x = ACTIVATIONS[activation](x)
+        return x
+
+
+def fold_scaler(kernels, biases, mean, scale):
+    """Folds standardization (x - mean) / scale into the first dense layer.
+    Args: per-layer kernels and biases, the scaler's mean_ and scale_.
+    Returns: tuple of (kernels, biases) that accept unscaled features.
+    """
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+    first_kernel = np.asarray(kernels[0], dtype=np.float64)
+
+    # ((x - mean) / scale) @ W + b == x @ (W / scale) + (b - (mean / scale) @ W)
+    folded_kernel = first_kernel / scale[:, None]
+    folded_bias = np.asarray(biases[0], dtype=np.float64) - (mean / scale) @ first_kernel
+    return [folded_kernel] + list(kernels[1:]), [folded_bias] + list(biases[1:])
+
+
+def quantize_int8(kernel):
+    """Symmetric int8 quantization of a dense kernel with a scale per input row and per output unit.
+    The folded first layer has rows that differ by orders of magnitude (soil pH against rainfall),
+    which a per-unit scale alone would round to zero.
+    Args: kernel of shape (n_inputs, n_units).
+    Returns: tuple of (int8 kernel, row scale of shape (n_inputs, 1), unit scale of shape (n_units,)).
+    """
+    kernel = np.asarray(kernel, dtype=np.float64)
+    row_scale = np.abs(kernel).max(axis=1, keepdims=True)
+    # Rows or units whose weights are all zero would divide by zero
+    row_scale[row_scale == 0] = 1.0
+    scale = np.abs(kernel / row_scale).max(axis=0) / 127
+    scale[scale == 0] = 1.0
+    quantized = np.round(kernel / row_scale / scale).astype(np.int8)
+    return quantized, row_scale.astype(np.float32), scale.astype(np.float32)
+
+
+def dequantize(kernel, row_scale=None, scale=None):
+    """Expands a stored kernel back to float32, applying its int8 scales if it has them."""
+    kernel = np.asarray(kernel, dtype=np.float32)
+    if row_scale is not None:
+        kernel = kernel * row_scale
+    if scale is not None:
+        kernel = kernel * scale
+    return kernel
@@ -0,0 +1,50 @@
+import streamlit as st
+import plotly.express as px
+from crop_summary import load_crop_summary
+from crop_sweep import FEATURE_LABELS, build_sweep_figure, sweep
+from crop_metrics import render_metrics_sidebar
+
+# Set page configuration for layout customization
+st.set_page_config(
+    page_title="What-if Sweep",
+    page_icon="🧭",
+    layout="centered",  # Center the app on the screen
+    initial_sidebar_state="auto",
+)
+
+st.title("What-if Crop Sweep")
+st.write("Fix the soil and climate conditions, then vary one or two of them to see where the recommended crop changes.")
+
+# Defaults and slider ranges come from the historical data
+summary = load_crop_summary().table()
+
+# Features to vary over a range
+x_feature = st.selectbox("Vary", range(len(FEATURE_LABELS)), index=6, format_func=lambda i: FEATURE_LABELS[i])
+y_options = [None] + [i for i in range(len(FEATURE_LABELS)) if i != x_feature]
+y_feature = st.selectbox("And optionally", y_options, index=y_options.index(3) if 3 in y_options else 0,
+                         format_func=lambda i: "Nothing (1-D sweep)" if i is None else FEATURE_LABELS[i])
+steps = st.slider("Grid points per feature", 20, 400, 200, step=10)
+
+def feature_range(feature):
+    low, high = float(summary.iloc[:, feature]['min']), float(summary.iloc[:, feature]['max'])
+    return st.slider(f"{FEATURE_LABELS[feature]} range", low, high, (low, high))
+
+x_range = feature_range(x_feature)
+y_range = feature_range(y_feature) if y_feature is not None else None
+
+# Fixed values for the features that do not vary
+st.sidebar.subheader("Fixed Conditions")
+base_features = []
+for i, label in enumerate(FEATURE_LABELS):
+    median = float(summary.iloc[:, i]['p50'])
+    disabled = i in (x_feature, y_feature)
+    base_features.append(st.sidebar.number_input(label, value=median, disabled=disabled))
+
+try:
+    result = sweep(base_features, x_feature, x_range, y_feature, y_range, steps)
+    st.plotly_chart(build_sweep_figure(result, px.colors.qualitative.Alphabet))
+    st.caption(f"Scored {result.n_points:,} inputs in {result.seconds * 1000:,.0f} ms with one batched forward pass.")
+except Exception as e:
+    st.error(f"Error during sweep: {e}")
+
+render_metrics_sidebar()
@@ -1,5 +1,8 @@
+import os
+import sys
+# Shared modules live at the repository root, two levels above this page
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import streamlit as st
-st.set_option('deprecation.showPyplotGlobalUse', False)
 import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
@@ -8,62 +11,38 @@ import plotly.figure_factory as ff
 import seaborn as sns
 import matplotlib.pyplot as plt
 from pandas.plotting import scatter_matrix
+from crop_data import categories, classified_plants, load_crop_data, load_info, plants
+from crop_summary import ALL, load_crop_summary
+from crop_charts import (LINE_CHART_POINTS, PAIR_PLOT_POINT_BUDGET, build_correlation_heatmap, build_line_chart,
+                         build_npk_pie, build_pair_plot, build_thr_pie, figure_cache, figure_png)
+from crop_metrics import render_metrics_sidebar, timed
 import plotly.figure_factory as ff
 
-# Load your crop recommendation data
-data = pd.read_csv('./data/304_dataset.csv')
-def clean_crop_data(df):
-    """Cleans and prepares crop data for analysis.
-    Args: pd.DataFrame crop data to be cleaned.
-    Returns: The cleaned crop data.
-    """
-    # Clean column names
-    # remove brackets
-    df.columns = [col.lower().strip().replace('(', ' ').replace(')', '') for col in df.columns]
-
-    # replace whitespace with underscores
-    df.columns = [col.replace(' ', "_") for col in df.columns]
-    # Drop null values
-    df.dropna(inplace=True)
-
-    # Round specified columns to 4 decimal places
-    for col in ['temperature_f', 'humidity', 'soil_ph', 'rainfall_mm']:
-        df[col] = df[col].round(4)
-
-    # Drop duplicates
-    df.drop_duplicates(inplace=True)
-
-    # Drop records with label "mungbean"
-    df = df.query('label != "mungbean"')
-    return df
-
-# Applying the data cleaning function
-crop_data = clean_crop_data(data)
+# Load the cleaned crop recommendation data, shared across pages and reruns
+crop_data = load_crop_data()
+crop_summary = load_crop_summary()
 
 # Custom colors for each crop
 colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f']
 
-# Plant Category Code
-plants = ['Carrots', 'onions', 'pomegranate', 'rice', 'greengram', 'lentil', 'mango', 'chickpea', 'coffee', 'papaya',
-          'pigeonpeas', 'apple', 'maize', 'banana', 'kidneybeans', 'coconut', 'grapes', 'cotton',
-          'lettuce', 'tomato', 'Cabbage', 'watermelon', 'orange']
+# Features shown in the pair plot and the correlation matrix
+PAIR_PLOT_FEATURES = ["temperature_f", "humidity", "rainfall_mm", "nitrogen_pmm", "phosphorus_pmm", "potassium_mm"]
 
-# Define categories and corresponding plants
-categories = {
-    "vegetables": ["Carrots", "onions", "lettuce", "tomato", "Cabbage"],
-    "cereals": ["rice", "maize"],
-    "fruits": ["pomegranate", "mango", "apple", "papaya", "banana", "grapes", "orange"],
-    "legumes": ["greengram", "lentil", "chickpea", "pigeonpeas", "kidneybeans", "mungbean"],
-    "others": ["coffee", "coconut", "cotton"]
-}
+def pair_plot_figure(selected_category, selected_plant, point_budget):
+    """Fast pair plot for one (category, plant) selection."""
+    pair_plot_data = crop_data[PAIR_PLOT_FEATURES + ['label']]
+    if selected_category != "All":
+        pair_plot_data = pair_plot_data[pair_plot_data['label'] == selected_plant]
+    return build_pair_plot(pair_plot_data, PAIR_PLOT_FEATURES, f"Pair Plot for {selected_plant}", point_budget)
 
-# Classify plants into categories
-classified_plants = {category: [plant for plant in plants if plant in plant_list] for category, plant_list in categories.items()}
+def line_chart_figure(selected_category, selected_plant, n_points, x_range, method):
+    """Downsampled line chart for one selection and zoom range."""
+    line_chart_data = crop_data[crop_data['label'] == selected_plant] if selected_category != "All" else crop_data
+    return build_line_chart(line_chart_data, f"Temperature, Humidity, and Rainfall Trends for {selected_plant}",
+                            n_points, x_range, method)
 
-st.markdown("<h1 style='text-align: left; color: black;'>Crop Recommendation Dashboard</h1>", unsafe_allow_html=True)
 
-# NPK and THR Subplots
-st.subheader("NPK and THR Charts")
+st.markdown("<h1 style='text-align: left; color: black;'>Crop Recommendation Dashboard</h1>", unsafe_allow_html=True)
 
 selected_category = st.sidebar.selectbox("Select Category", ["All"] + list(categories.keys()))
 
@@ -71,80 +50,95 @@ selected_category = st.sidebar.selectbox("Select Category", ["All"] + list(categ
 selected_plants = classified_plants.get(selected_category, plants)
 selected_subcategory_plant = st.sidebar.selectbox("Select Subcategory Plant", selected_plants)
 
+# Chart settings stay in the sidebar, so they keep their values while sections are closed
+line_chart_points = st.sidebar.slider("Line Chart Points", 200, 5000, LINE_CHART_POINTS, step=100)
+line_chart_method = st.sidebar.radio("Line Chart Downsampling", ["lttb", "minmax"])
+pair_plot_mode = st.sidebar.radio("Pair Plot Mode", ["Fast (WebGL)", "Seaborn (all rows)"])
+if pair_plot_mode == "Fast (WebGL)":
+    point_budget = st.sidebar.slider("Pair Plot Points", 500, 20000, PAIR_PLOT_POINT_BUDGET, step=500)
+
 filtered_data = crop_data[crop_data['label'] == selected_subcategory_plant] if selected_category != "All" else crop_data
+# Summary statistics for the same selection, looked up instead of recomputed
+summary_group = selected_subcategory_plant if selected_category != "All" else ALL
+# Every figure is memoized per selection and version of the data
+selection = (selected_category, selected_subcategory_plant, load_info['sha256'])
 
 # Check if the DataFrame is not empty and contains the 'label' column before accessing it
 if not filtered_data.empty and 'label' in filtered_data.columns:
-    # NPK Pie Chart
-    fig_npk = make_subplots(rows=1, cols=3, specs=[[{'type': 'domain'}, {'type': 'domain'}, {'type': 'domain'}]])
-
-    avg_npk_values = filtered_data[['nitrogen_pmm', 'phosphorus_pmm', 'potassium_mm']].mean()
-    values_npk = [avg_npk_values['nitrogen_pmm'], avg_npk_values['phosphorus_pmm'], avg_npk_values['potassium_mm']]
-
-    fig_npk.add_trace(go.Pie(labels=['Nitrogen(N)', 'Phosphorous(P)', 'Potash(K)'], values=values_npk, hole=0,
-                             marker=dict(colors=['red', 'blue', 'green'])), 1, 1)
-
-    fig_npk.update_layout(title_text=f"Nitrogen, Phosphorus and Potassium Chart for {selected_subcategory_plant}")
-
-    # THR Pie Chart
-    fig_thr = make_subplots(rows=1, cols=3, specs=[[{'type': 'domain'}, {'type': 'domain'}, {'type': 'domain'}]])
-
-    avg_thr_values = filtered_data[['temperature_f', 'humidity', 'rainfall_mm']].mean()
-    values_thr = [avg_thr_values['temperature_f'], avg_thr_values['humidity'], avg_thr_values['rainfall_mm']]
-
-    fig_thr.add_trace(go.Pie(labels=['Temperature', 'Humidity', 'Rainfall'], values=values_thr, hole=0,
-                             marker=dict(colors=['red', 'blue', 'green'])), 1, 1)
-
-    fig_thr.update_layout(title_text=f"Temperature, Humidity and Rainfall Chart for {selected_subcategory_plant}")
-
-    # Display the NPK and THR pie charts
-    st.plotly_chart(fig_npk)
-    st.plotly_chart(fig_thr)
-
-    # Line Chart for Temperature, Humidity, and Rainfall
-    st.subheader("Line Chart for Temperature, Humidity, and Rainfall")
-    line_chart_data = crop_data[crop_data['label'] == selected_subcategory_plant] if selected_category != "All" else crop_data
-
-    fig_line_chart = go.Figure()
-
-    # Adding traces for Temperature, Humidity, and Rainfall
-    fig_line_chart.add_trace(go.Scatter(x=line_chart_data.index, y=line_chart_data['temperature_f'],
-                                        mode='lines', name='Temperature', line=dict(color='red')))
-    fig_line_chart.add_trace(go.Scatter(x=line_chart_data.index, y=line_chart_data['humidity'],
-                                        mode='lines', name='Humidity', line=dict(color='blue')))
-    fig_line_chart.add_trace(go.Scatter(x=line_chart_data.index, y=line_chart_data['rainfall_mm'],
-                                        mode='lines', name='Rainfall', line=dict(color='green')))
-
-    fig_line_chart.update_layout(title=f"Temperature, Humidity, and Rainfall Trends for {selected_subcategory_plant}",
-                                 xaxis_title="Index", yaxis_title="Values")
-
-    st.plotly_chart(fig_line_chart)
-
-    
-    # Pair Plot
-    st.subheader("Pair Plot")
-    selected_features = ["temperature_f", "humidity", "rainfall_mm", "nitrogen_pmm", "phosphorus_pmm", "potassium_mm", "label"]
-    pair_plot_data = crop_data[selected_features]
-
-    # Filter data based on selected category for pair plot
-    pair_plot_data_category = pair_plot_data[pair_plot_data['label'] == selected_subcategory_plant] if selected_category != "All" else pair_plot_data
-
-    # Seaborn Pair Plot
-    plt.figure(figsize=(12, 8))
-    pair_plot = sns.pairplot(pair_plot_data_category, hue='label', palette=colors)
-    pair_plot.fig.suptitle(f"Pair Plot for {selected_subcategory_plant}", y=1.02)
-    st.pyplot()
-
-    # Correlation Matrix
-    st.subheader("Correlation Matrix")
-    correlation_data = pair_plot_data_category.drop(columns=['label'])  # Exclude 'label' for correlation matrix
-    correlation_matrix = correlation_data.corr()
+    # Each section is built only while its expander is open
+    pies_section = st.expander("NPK and THR Charts", expanded=True, key="section_pies", on_change="rerun")
+    line_chart_section = st.expander("Line Chart for Temperature, Humidity, and Rainfall", key="section_line_chart",
+                                     on_change="rerun")
+    pair_plot_section = st.expander("Pair Plot", key="section_pair_plot", on_change="rerun")
+    correlation_section = st.expander("Correlation Matrix", key="section_correlation", on_change="rerun")
+
+    # Start every open section's figures in the shared thread pool first, then show them in page order
+    figures = {}
+    if pies_section.open:
+        avg_npk_values = crop_summary.mean(summary_group, ['nitrogen_pmm', 'phosphorus_pmm', 'potassium_mm'])
+        avg_thr_values = crop_summary.mean(summary_group, ['temperature_f', 'humidity', 'rainfall_mm'])
+        figures['npk'] = figure_cache.submit(('npk_pie',) + selection,
+                                             lambda: build_npk_pie(avg_npk_values, selected_subcategory_plant))
+        figures['thr'] = figure_cache.submit(('thr_pie',) + selection,
+                                             lambda: build_thr_pie(avg_thr_values, selected_subcategory_plant))
+
+    if line_chart_section.open:
+        # Each trace is downsampled to a fixed number of points; narrowing the range refines the detail
+        first_index, last_index = int(filtered_data.index.min()), int(filtered_data.index.max())
+        x_range = (first_index, last_index)
+        if first_index < last_index:
+            with line_chart_section:
+                x_range = st.slider("Index Range", first_index, last_index, (first_index, last_index))
+        figures['line_chart'] = figure_cache.submit(
+            ('line_chart', line_chart_points, x_range, line_chart_method) + selection,
+            lambda: line_chart_figure(selected_category, selected_subcategory_plant, line_chart_points, x_range,
+                                      line_chart_method))
+
+    if pair_plot_section.open and pair_plot_mode == "Fast (WebGL)":
+        # Stratified sample drawn as a WebGL scatter matrix
+        figures['pair_plot'] = figure_cache.submit(
+            ('pair_plot', point_budget) + selection,
+            lambda: pair_plot_figure(selected_category, selected_subcategory_plant, point_budget))
+
+    if correlation_section.open:
+        # Merged from per-label moments instead of rescanning the filtered rows, rendered once to PNG
+        correlation_matrix = crop_summary.correlation(summary_group, PAIR_PLOT_FEATURES)
+        figures['heatmap'] = figure_cache.submit(
+            ('correlation_heatmap',) + selection,
+            lambda: figure_png(build_correlation_heatmap(correlation_matrix, selected_subcategory_plant)))
+
+    if pies_section.open:
+        with pies_section:
+            # Display the NPK and THR pie charts
+            st.plotly_chart(figures['npk'].result())
+            st.plotly_chart(figures['thr'].result())
+
+    if line_chart_section.open:
+        with line_chart_section:
+            st.plotly_chart(figures['line_chart'].result())
+
+    if pair_plot_section.open:
+        with pair_plot_section:
+            if pair_plot_mode == "Fast (WebGL)":
+                st.plotly_chart(figures['pair_plot'].result())
+            else:
+                pair_plot_data = crop_data[PAIR_PLOT_FEATURES + ["label"]].astype({'label': str})
+
+                # Filter data based on selected category for pair plot
+                pair_plot_data_category = pair_plot_data[pair_plot_data['label'] == selected_subcategory_plant] if selected_category != "All" else pair_plot_data
+
+                # Seaborn Pair Plot; seaborn draws through pyplot, so this stays on the script thread
+                with timed('figure.seaborn_pair_plot'):
+                    plt.figure(figsize=(12, 8))
+                    pair_plot = sns.pairplot(pair_plot_data_category, hue='label', palette=colors)
+                    pair_plot.fig.suptitle(f"Pair Plot for {selected_subcategory_plant}", y=1.02)
+                st.pyplot(pair_plot.fig, clear_figure=True)
+
+    if correlation_section.open:
+        with correlation_section:
+            st.image(figures['heatmap'].result())
+render_metrics_sidebar()
 
-    # Plotting the correlation matrix as a heatmap
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5)
-    plt.title(f"Correlation Matrix for {selected_subcategory_plant}")
-    st.pyplot()
 # Sidebar links
 st.sidebar.markdown("[More Visuals](<URL_TO_MORE_VISUALS_APP>)")
 st.sidebar.markdown("[Predictor](<URL_TO_PREDICTOR_APP>)")
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""Bounded LRU cache for predictions, keyed on quantized input features.
+
+Near-identical soil/climate tuples round to the same key, so repeated requests
+skip the scaler and the model. Entries can also expire after a TTL, and the
+whole cache is dropped when the artifacts change on disk.
+
+Configuration for the shared cache comes from the environment:
+    CROP_CACHE_SIZE  maximum number of entries (default 4096, 0 disables caching)
+    CROP_CACHE_TTL   seconds before an entry expires (default: never)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import crop_artifacts
+
+# Decimal places kept per feature when building cache keys, in model input order:
+# nitrogen, phosphorus, potassium, temperature, humidity, soil_ph, rainfall
+DEFAULT_PRECISION = (0, 0, 0, 1, 1, 2, 1)
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with optional TTL eviction and artifact-change invalidation."""
+
+    def __init__(self, maxsize=4096, ttl=None, precision=DEFAULT_PRECISION, check_interval=1.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.precision = tuple(precision)
+        self.check_interval = check_interval
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = crop_artifacts.artifact_fingerprint()
+        self._last_check = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, features):
+        """Quantizes a feature tuple to the configured per-feature precision."""
+        if len(features) != len(self.precision):
+            raise ValueError(f"Expected {len(self.precision)} features, got {len(features)}")
+        # Adding 0.0 turns -0.0 into 0.0 so both round to the same key
+        return tuple(round(float(value), digits) + 0.0 for value, digits in zip(features, self.precision))
+
+    def get_or_compute(self, features, compute):
+        """Returns the cached prediction for features, calling compute() on a miss.
+        Args: sequence of seven input features, zero-argument callable producing the prediction.
+        Returns: the cached or freshly computed prediction. None results are not cached.
+        """
+        if self.maxsize <= 0:
+            return compute()
+
+        self._check_artifacts()
+        key = self.key(features)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                # The entry is stale: drop it and recompute
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Compute outside the lock so slow predictions do not block cache hits
+        value = compute()
+        if value is None:
+            return value
+        if hasattr(value, 'setflags'):
+            # Entries are shared between callers, so make arrays read-only
+            value.setflags(write=False)
+
+        expires = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns the hit/miss/eviction counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    def _check_artifacts(self):
+        # Stat the artifact files at most once per check_interval
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        fingerprint = crop_artifacts.artifact_fingerprint()
+        if fingerprint != self._fingerprint:
+            with self._lock:
+                self._fingerprint = fingerprint
+                self._entries.clear()
+                self.invalidations += 1
+            # Make the next prediction use the new artifacts too
+            crop_artifacts.reload_artifacts()
+
+
+def _env_ttl():
+    ttl = os.environ.get('CROP_CACHE_TTL')
+    return float(ttl) if ttl else None
+
+
+# One cache shared by every session in the process
+prediction_cache = PredictionCache(maxsize=int(os.environ.get('CROP_CACHE_SIZE', 4096)), ttl=_env_ttl())
@@ -0,0 +1,320 @@
+"""Constant-memory log of the inputs the predictor sees, for drift monitoring.
+
+Predictions are not stored. Each process counts predictions per crop and
+buffers a few hundred input rows, then folds them into one KLL quantile
+sketch per feature. Memory stays bounded by the sketch size, however many
+predictions arrive. Recording one prediction copies a row into the buffer, a
+few microseconds at most, and the sketch work is amortized over the batch.
+
+About once a minute, and at exit, each process appends one JSON line with
+the sketches and counters of the predictions since its previous line, then
+starts afresh. Lines never overlap and sketches and counters are mergeable,
+so any set of lines merges into the view of their predictions. Each line is
+stamped with the WINDOW_SECONDS window it started in. Once the file passes
+LOG_MAX_BYTES, compaction folds every line into one line per window and drops
+windows older than LOG_RETENTION, so the log stays bounded however many
+processes come and go. Writers and compaction take turns on a lock file next
+to the log, since compaction replaces the log file itself. drift_report
+compares the sketches of the last DRIFT_WINDOW_SECONDS with a baseline sketch
+of data/304_dataset.csv, using the Kolmogorov-Smirnov distance per feature.
+
+CROP_PREDICTION_LOG sets the log path (default logs/prediction_log.jsonl);
+set it to 0 to turn logging off.
+
+Usage: python prediction_log.py [--log PATH] [--hours HOURS] [--compact]
+"""
+import argparse
+import atexit
+import contextlib
+import fcntl
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+from crop_artifacts import is_loaded, load_artifacts
+from crop_data import BASE_DIR, DATA_PATH, FEATURES, load_crop_data, load_info
+from quantile_sketch import DEFAULT_K, KLLSketch, ks_distance
+
+_log_setting = os.environ.get('CROP_PREDICTION_LOG', os.path.join(BASE_DIR, 'logs', 'prediction_log.jsonl'))
+LOG_PATH = None if _log_setting.lower() in ('', '0', 'false', 'no') else _log_setting
+
+# Rows buffered before they are folded into the sketches, and the longest a row waits
+BUFFER_SIZE = 512
+FLUSH_INTERVAL = 60.0
+
+# Compact the log into one line per window once it grows past this size
+LOG_MAX_BYTES = 8 * 1024 * 1024
+
+# Compacted lines cover this much time each, and are kept for this long
+WINDOW_SECONDS = 3600
+LOG_RETENTION = 7 * 24 * 3600
+
+# drift_report scores the predictions of this recent span
+DRIFT_WINDOW_SECONDS = 24 * 3600
+
+# Kolmogorov-Smirnov distance above which a feature counts as drifted
+DRIFT_THRESHOLD = 0.2
+
+
+class PredictionLog:
+    """Per-process buffer, sketches and crop counters behind the append-only log.
+    Everything is reset after each line is written, so a line holds only the predictions since the previous one.
+    """
+
+    def __init__(self, path=LOG_PATH, buffer_size=BUFFER_SIZE, flush_interval=FLUSH_INTERVAL, k=DEFAULT_K,
+                 max_bytes=LOG_MAX_BYTES):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.k = k
+        self.process = f'{socket.gethostname()}-{os.getpid()}-{int(time.time())}'
+        self._buffer = np.empty((buffer_size, len(FEATURES)))
+        self._size = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._reset_locked()
+
+    def _reset_locked(self):
+        self.sketches = {feature: KLLSketch(self.k) for feature in FEATURES}
+        self.class_counts = np.zeros(64, dtype=np.int64)
+        # Wall-clock time of the first prediction not yet written out
+        self._since = None
+
+    def record(self, features, class_index):
+        """Logs one prediction: the seven input features in model order and the predicted class index."""
+        with self._lock:
+            if self._since is None:
+                self._since = time.time()
+            self._buffer[self._size] = features
+            self._size += 1
+            if class_index >= len(self.class_counts):
+                self.class_counts = np.pad(self.class_counts, (0, class_index + 1 - len(self.class_counts)))
+            self.class_counts[class_index] += 1
+            if time.monotonic() - self._last_flush > self.flush_interval:
+                self._flush_locked()
+            elif self._size == len(self._buffer):
+                self._fold_locked()
+
+    def record_batch(self, input_data, class_indices):
+        """Logs many predictions at once, straight into the sketches.
+        The log file is only appended to once flush_interval has passed, however often this is called.
+        """
+        input_data = np.asarray(input_data, dtype=np.float64)
+        counts = np.bincount(np.asarray(class_indices, dtype=np.int64), minlength=len(self.class_counts))
+        with self._lock:
+            if self._since is None:
+                self._since = time.time()
+            if len(counts) > len(self.class_counts):
+                self.class_counts = np.pad(self.class_counts, (0, len(counts) - len(self.class_counts)))
+            self.class_counts[:len(counts)] += counts
+            for i, feature in enumerate(FEATURES):
+                self.sketches[feature].update(input_data[:, i])
+            if time.monotonic() - self._last_flush > self.flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _fold_locked(self):
+        for i, feature in enumerate(FEATURES):
+            self.sketches[feature].update(self._buffer[:self._size, i])
+        self._size = 0
+
+    def _flush_locked(self):
+        self._fold_locked()
+        self._last_flush = time.monotonic()
+        if not self.class_counts.any():
+            return
+        if self.path is not None:
+            try:
+                self._append(self.snapshot())
+            except OSError:
+                # Monitoring must never break predictions; these rows go out with the next line instead
+                return
+        self._reset_locked()
+
+    def snapshot(self):
+        """Returns the sketches and crop counters since the last line written as a JSON-friendly dict."""
+        return {
+            'process': self.process,
+            'window': _window_start(self._since if self._since is not None else time.time()),
+            'time': time.time(),
+            'crops': _crop_counts(self.class_counts),
+            'sketches': {feature: sketch.to_dict() for feature, sketch in self.sketches.items()},
+        }
+
+    def _append(self, snapshot):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # One writer at a time, across processes, so lines never interleave
+        with _locked(self.path):
+            with open(self.path, 'a') as log_file:
+                log_file.write(json.dumps(snapshot) + '\n')
+                size = log_file.tell()
+            if size > self.max_bytes:
+                compact_log(self.path, locked=True)
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Holds an exclusive lock on the log's lock file, across processes.
+    The log itself cannot be locked: compaction replaces it, and a writer blocked on the old
+    file would then append to a file no longer in the log's place.
+    """
+    with open(f'{path}.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _crop_counts(class_counts):
+    # Every hook runs after a prediction, so the artifacts are loaded; never load them here, as this also runs at exit
+    label_encoder = np.asarray(load_artifacts().label_encoder) if is_loaded() else np.empty(0)
+    return {str(label_encoder[i]) if i < len(label_encoder) else f'class_{i}': int(count)
+            for i, count in enumerate(class_counts) if count}
+
+
+def _window_start(timestamp):
+    return int(timestamp // WINDOW_SECONDS * WINDOW_SECONDS)
+
+
+def _read_snapshots(path):
+    with open(path) as log_file:
+        for line in log_file:
+            try:
+                snapshot = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash
+                continue
+            # Lines written before windows held cumulative counts, which do not add up with these
+            if 'window' in snapshot:
+                yield snapshot
+
+
+def _merge_snapshot(sketches, crops, snapshot):
+    for feature, state in snapshot['sketches'].items():
+        if feature in sketches:
+            sketches[feature].merge(KLLSketch.from_dict(state))
+    for crop, count in snapshot['crops'].items():
+        crops[crop] = crops.get(crop, 0) + count
+
+
+def compact_log(path=LOG_PATH, locked=False, now=None):
+    """Rewrites the log as one line per window, without the windows older than LOG_RETENTION.
+    Lines never overlap, so those of processes still running fold in as safely as those of processes long gone.
+    """
+    if not locked:
+        with _locked(path):
+            return compact_log(path, locked=True, now=now)
+    oldest = _window_start((time.time() if now is None else now) - LOG_RETENTION)
+    windows = {}
+    for snapshot in _read_snapshots(path):
+        if snapshot['window'] < oldest:
+            continue
+        window = windows.setdefault(snapshot['window'], {
+            'process': 'compacted',
+            'window': snapshot['window'],
+            'time': 0.0,
+            'crops': {},
+            'sketches': {feature: KLLSketch() for feature in FEATURES},
+        })
+        _merge_snapshot(window['sketches'], window['crops'], snapshot)
+        window['time'] = max(window['time'], snapshot['time'])
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as tmp_file:
+        for _, window in sorted(windows.items()):
+            window['sketches'] = {feature: sketch.to_dict() for feature, sketch in window['sketches'].items()}
+            tmp_file.write(json.dumps(window) + '\n')
+    os.replace(tmp_path, path)
+
+
+def load_merged(path=LOG_PATH, since=None):
+    """Merges the lines of the log, optionally only those of windows that end after a given time.
+    Returns: tuple of (dict of feature to KLLSketch, dict of crop to prediction count, number of windows).
+    """
+    sketches = {feature: KLLSketch() for feature in FEATURES}
+    crops = {}
+    windows = set()
+    snapshots = _read_snapshots(path) if path and os.path.exists(path) else ()
+    for snapshot in snapshots:
+        if since is None or snapshot['window'] + WINDOW_SECONDS > since:
+            _merge_snapshot(sketches, crops, snapshot)
+            windows.add(snapshot['window'])
+    return sketches, crops, len(windows)
+
+
+_baseline = {}
+
+
+def baseline_sketches(path=DATA_PATH):
+    """Sketches each feature of the training data, once per version of the file."""
+    crop_data = load_crop_data(path)
+    key = (path, load_info['sha256'])
+    if key not in _baseline:
+        sketches = {}
+        for feature in FEATURES:
+            sketches[feature] = KLLSketch(seed=0)
+            sketches[feature].update(crop_data[feature].to_numpy(dtype=np.float64))
+        _baseline.clear()
+        _baseline[key] = sketches
+    return _baseline[key]
+
+
+_report_lock = threading.Lock()
+_report = {'time': None, 'value': None}
+
+
+def drift_report(path=LOG_PATH, max_age=FLUSH_INTERVAL, window=DRIFT_WINDOW_SECONDS):
+    """Scores the inputs logged in the last window seconds against the training data, at most once per max_age seconds.
+    Returns: dict with the prediction count, per-feature KS distances, drifted features and crop counts.
+    """
+    with _report_lock:
+        if _report['time'] is not None and time.monotonic() - _report['time'] < max_age:
+            return _report['value']
+        sketches, crops, _ = load_merged(path, since=time.time() - window)
+        baseline = baseline_sketches()
+        scores = {feature: ks_distance(sketch, baseline[feature]) for feature, sketch in sketches.items()}
+        report = {
+            'predictions': sum(crops.values()),
+            'hours': window / 3600,
+            'scores': scores,
+            'max_score': max(scores.values()) if scores else 0.0,
+            'drifted': [feature for feature, score in scores.items() if score > DRIFT_THRESHOLD],
+            'crops': dict(sorted(crops.items(), key=lambda item: -item[1])),
+        }
+        _report.update(time=time.monotonic(), value=report)
+        return report
+
+
+prediction_log = PredictionLog()
+atexit.register(prediction_log.flush)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--log', default=LOG_PATH, help="Prediction log to read")
+    parser.add_argument('--hours', type=float, default=DRIFT_WINDOW_SECONDS / 3600,
+                        help="Score the predictions of this many recent hours")
+    parser.add_argument('--compact', action='store_true', help="Fold the log into one line per window")
+    args = parser.parse_args()
+    if not args.log or not os.path.exists(args.log):
+        print(f"No prediction log at {args.log}")
+        return 1
+
+    if args.compact:
+        compact_log(args.log)
+    report = drift_report(args.log, max_age=0, window=args.hours * 3600)
+    print(f"{report['predictions']:,} predictions in the last {report['hours']:g} hours")
+    for feature, score in report['scores'].items():
+        flag = '  DRIFT' if feature in report['drifted'] else ''
+        print(f"  {feature:16s} KS {score:.3f}{flag}")
+    print("Predicted crops: " + ', '.join(f"{crop} {count:,}" for crop, count in report['crops'].items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
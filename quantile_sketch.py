@@ -0,0 +1,105 @@
+"""Mergeable streaming quantile sketches.
+
+KLLSketch summarizes a stream of values in O(k) memory and answers quantile
+and CDF queries with a rank error of about 1.7 / k. Two sketches merge into
+one that summarizes both streams, so per-process or per-group sketches can be
+combined without the underlying values. Used by prediction_log.py for input
+drift and by crop_summary.py for per-group quantiles.
+"""
+import numpy as np
+
+# Sketch accuracy parameter: rank error is about 1.7 / k
+DEFAULT_K = 200
+
+
+class KLLSketch:
+    """Mergeable streaming quantile sketch in the style of Karnin, Lang and Liberty (KLL).
+
+    Items at level h stand for 2**h original values. When a level outgrows its
+    capacity it is sorted and every other item, from a random offset, moves up
+    one level. Lower levels get geometrically smaller capacities, so the sketch
+    holds O(k) items in total.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.levels) - level - 1))))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[level])
+                # An odd item out stays behind, so the promoted pairs keep the total weight exact
+                leftover, items = (items[:1], items[1:]) if len(items) % 2 else (items[:0], items)
+                # Copy the leftover, so a view does not keep the whole sorted level alive
+                self.levels[level] = leftover.copy()
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[self._rng.integers(2)::2]])
+            level += 1
+
+    def update(self, values):
+        """Adds a batch of values; NaN and infinite values are skipped."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """Folds another sketch into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Estimates the value at quantile q (a float or an array of floats in [0, 1])."""
+        items, cumulative = self._weighted_items()
+        if not len(items):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float('nan')
+        ranks = np.asarray(q, dtype=np.float64) * cumulative[-1]
+        return items[np.minimum(np.searchsorted(cumulative, ranks), len(items) - 1)]
+
+    def cdf(self, x):
+        """Estimates the fraction of values at or below x (a float or an array)."""
+        items, cumulative = self._weighted_items()
+        if not len(items):
+            return np.zeros(np.shape(x)) if np.ndim(x) else 0.0
+        positions = np.searchsorted(items, x, side='right')
+        return np.where(positions > 0, cumulative[np.maximum(positions - 1, 0)], 0.0) / cumulative[-1]
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'levels': [np.round(level, 6).tolist() for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['k'])
+        sketch.n = state['n']
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in state['levels']]
+        return sketch
+
+
+def ks_distance(sketch, baseline):
+    """Largest gap between two sketched distributions' CDFs (0 = same, 1 = disjoint)."""
+    if not sketch.n or not baseline.n:
+        return 0.0
+    grid = np.union1d(np.concatenate(sketch.levels), np.concatenate(baseline.levels))
+    return float(np.abs(sketch.cdf(grid) - baseline.cdf(grid)).max())
@@ -0,0 +1,240 @@
+"""Exports quantized variants of the crop model and reports what they cost.
+
+Usage:
+    python quantize_model.py             # write the quantized variants next to the app
+    python quantize_model.py --report    # also compare every engine on the dataset
+
+Variants, selected at runtime with CROP_ENGINE:
+    numpy-float16   Intelligent_Crop_Selector.float16.npz    float16 kernels
+    numpy-int8      Intelligent_Crop_Selector.int8.npz       int8 kernels, per-row and per-unit scales
+    tflite-float16  Intelligent_Crop_Selector.float16.tflite float16 weights
+    tflite-int8     Intelligent_Crop_Selector.int8.tflite    int8 weights and activations,
+                                                             calibrated on the dataset
+
+The NumPy variants are made from Intelligent_Crop_Selector.npz, the TFLite
+ones from the SavedModel. Each records the SHA-256 of
+Intelligent_Crop_Selector.npz, inside the .npz or in a .source.json file
+next to the .tflite, and the app refuses it once the model changes. The report runs each engine in a fresh process and
+measures:
+    - accuracy on the cleaned dataset, and agreement with the Keras model
+    - model file size
+    - peak resident memory
+    - single-row latency and batch throughput
+It writes the results to benchmarks/quantization_report.md.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from crop_artifacts import (BASE_DIR, MODEL_PATH, MODEL_VARIANTS, NUMPY_MODEL_PATH, load_artifacts, model_sha256,
+                            variant_source_path)
+from crop_data import DATA_PATH, FEATURES, load_crop_data
+
+REPORT_PATH = os.path.join(BASE_DIR, 'benchmarks', 'quantization_report.md')
+
+# Engines compared by the report, the unquantized reference first
+REPORT_ENGINES = ('keras', 'numpy', 'numpy-float16', 'numpy-int8', 'tflite-float16', 'tflite-int8')
+
+
+def export_numpy_variants():
+    """Writes the float16 and int8 NumPy variants of the exported weights."""
+    from numpy_inference import NumpyCropModel
+
+    numpy_model = NumpyCropModel.load(NUMPY_MODEL_PATH)
+    for weight_dtype in ('float16', 'int8'):
+        numpy_model.save(MODEL_VARIANTS[f'numpy-{weight_dtype}'], weight_dtype, source_sha256=model_sha256())
+
+
+def export_tflite(quantization, output_path, saved_model_path=MODEL_PATH):
+    """Converts the SavedModel to TFLite with post-training quantization.
+    Args: 'float16' or 'int8', output path, SavedModel directory.
+    """
+    import pickle
+
+    import tensorflow as tf
+
+    from crop_artifacts import SCALER_PATH
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_path)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        # Calibrate activation ranges on standardized rows of the dataset
+        with open(SCALER_PATH, 'rb') as scaler_file:
+            scaler = pickle.load(scaler_file)
+        calibration = scaler.transform(load_crop_data(DATA_PATH)[FEATURES].to_numpy(dtype=np.float64))
+        calibration = calibration.astype(np.float32)
+
+        def representative_dataset():
+            for row in calibration:
+                yield [row[np.newaxis, :]]
+
+        converter.representative_dataset = representative_dataset
+    else:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    with open(output_path, 'wb') as model_file:
+        model_file.write(converter.convert())
+    # The SavedModel and the exported weights come from the same bundle, so the weights identify both
+    with open(variant_source_path(output_path), 'w') as source_file:
+        json.dump({'source_sha256': model_sha256()}, source_file)
+
+
+def _peak_rss_mb():
+    # ru_maxrss survives exec, so a child started by a large parent would report the parent's peak;
+    # VmHWM belongs to this process image alone
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_engine(probabilities_path, n_single=200, batch_size=8192):
+    """Measures the CROP_ENGINE engine in this process and prints the results as JSON.
+    Meant to run in a fresh interpreter, so memory and load time are not shared between engines.
+    """
+    crop_data = load_crop_data(DATA_PATH)
+    input_data = crop_data[FEATURES].to_numpy(dtype=np.float64)
+    labels = crop_data['label'].astype(str).to_numpy()
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    artifacts = load_artifacts()
+    load_seconds = time.perf_counter() - start
+
+    # Outputs past the last crop name are unused, so they are left out of accuracy and the comparison
+    probabilities = artifacts.predict_proba(input_data)[:, :len(artifacts.label_encoder)]
+    predictions = np.asarray(artifacts.label_encoder)[probabilities.argmax(axis=1)]
+    np.save(probabilities_path, probabilities)
+
+    latencies = []
+    for i in range(n_single):
+        row = input_data[i % len(input_data)][np.newaxis, :]
+        start = time.perf_counter()
+        artifacts.predict_proba(row)
+        latencies.append(time.perf_counter() - start)
+
+    batch = input_data[np.arange(batch_size) % len(input_data)]
+    batch_times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        artifacts.predict_proba(batch)
+        batch_times.append(time.perf_counter() - start)
+
+    print(json.dumps({
+        'accuracy': float((predictions == labels).mean()),
+        'load_seconds': load_seconds,
+        'peak_rss_mb': _peak_rss_mb(),
+        'model_rss_mb': _peak_rss_mb() - rss_before,
+        'single_row_p50_seconds': float(np.percentile(latencies, 50)),
+        'single_row_p99_seconds': float(np.percentile(latencies, 99)),
+        'batch_rows_per_second': batch_size / float(np.median(batch_times)),
+    }))
+
+
+def model_size(engine):
+    """Returns the size on disk of an engine's model file or directory, in bytes."""
+    path = MODEL_PATH if engine == 'keras' else MODEL_VARIANTS[engine]
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def build_report(engines=REPORT_ENGINES):
+    """Measures every engine in its own process.
+    Returns: list of dicts, one per engine; engines that fail to load carry an 'error' message.
+    """
+    rows, probabilities = [], {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for engine in engines:
+            row = {'engine': engine}
+            probabilities_path = os.path.join(tmp_dir, f'{engine}.npy')
+            result = subprocess.run(
+                [sys.executable, '-c', f'from quantize_model import measure_engine; measure_engine({probabilities_path!r})'],
+                cwd=BASE_DIR, env={**os.environ, 'CROP_ENGINE': engine}, capture_output=True, text=True)
+            if result.returncode != 0:
+                row['error'] = (result.stderr.strip().splitlines() or ['failed'])[-1]
+            else:
+                row.update(json.loads(result.stdout.strip().splitlines()[-1]))
+                row['size_bytes'] = model_size(engine)
+                probabilities[engine] = np.load(probabilities_path)
+            rows.append(row)
+
+    # Compare against the first engine that ran, normally the original Keras model
+    reference = next((row['engine'] for row in rows if 'error' not in row), None)
+    for row in rows:
+        if 'error' not in row:
+            difference = np.abs(probabilities[row['engine']] - probabilities[reference])
+            row['reference'] = reference
+            row['max_probability_difference'] = float(difference.max())
+            row['agreement'] = float((probabilities[row['engine']].argmax(axis=1) ==
+                                      probabilities[reference].argmax(axis=1)).mean())
+    return rows
+
+
+def format_report(rows):
+    """Renders the report rows as a Markdown table."""
+    lines = [
+        '# Quantized model report',
+        '',
+        f"Generated by `python quantize_model.py --report` on {time.strftime('%Y-%m-%d')}, "
+        f"{os.cpu_count()} CPU(s). Agreement and probability difference are measured against "
+        f"`{next((row['reference'] for row in rows if 'reference' in row), 'n/a')}` on every row of the "
+        f"cleaned dataset. Peak RSS is for a whole process that loaded the data and the engine; "
+        f"model RSS is the part added by loading the artifacts. The TFLite engines only stay small "
+        f"when ai-edge-litert or tflite-runtime is installed, otherwise they import TensorFlow.",
+        '',
+        '| Engine | Size (KB) | Accuracy | Agreement | Max prob. diff | Peak RSS (MB) | Model RSS (MB) '
+        '| Load (ms) | 1-row p50 (ms) | 1-row p99 (ms) | Batch (rows/s) |',
+        '|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|',
+    ]
+    for row in rows:
+        if 'error' in row:
+            lines.append(f"| {row['engine']} | failed: {row['error']} |" + ' |' * 9)
+            continue
+        lines.append(
+            f"| {row['engine']} | {row['size_bytes'] / 1024:,.1f} | {row['accuracy']:.2%} | {row['agreement']:.2%} "
+            f"| {row['max_probability_difference']:.1e} | {row['peak_rss_mb']:,.0f} | {row['model_rss_mb']:,.0f} "
+            f"| {row['load_seconds'] * 1000:,.0f} | {row['single_row_p50_seconds'] * 1000:.3f} "
+            f"| {row['single_row_p99_seconds'] * 1000:.3f} | {row['batch_rows_per_second']:,.0f} |")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--report', action='store_true', help="Compare every engine and write the report")
+    parser.add_argument('--skip-export', action='store_true', help="Report on the variants already on disk")
+    parser.add_argument('--output', default=REPORT_PATH, help="Where to write the Markdown report")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export_numpy_variants()
+        for quantization in ('float16', 'int8'):
+            export_tflite(quantization, MODEL_VARIANTS[f'tflite-{quantization}'])
+        for engine in REPORT_ENGINES[2:]:
+            print(f"Wrote {MODEL_VARIANTS[engine]} ({model_size(engine):,} bytes)")
+
+    if args.report:
+        report = format_report(build_report())
+        with open(args.output, 'w') as report_file:
+            report_file.write(report)
+        print(report)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
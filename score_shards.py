@@ -0,0 +1,220 @@
+"""Scores large CSV files in parallel, one shard per task, across a process pool.
+
+Usage:
+    python score_shards.py fields.csv --output predictions.csv
+    python score_shards.py season/*.csv --output predictions/ --per-shard --workers 8
+
+Inputs are laid out like data/304_dataset.csv. Each file is split into shards
+of about --shard-size bytes at line boundaries, so workers read their own byte
+ranges instead of receiving rows from the parent. Every worker loads the
+model, scaler and label encoder once, in the pool initializer, and limits
+BLAS to one thread so workers do not compete for cores. Shards are scored with
+the same add_predicted_crop logic as the app's bulk scoring.
+
+By default the scored shards are merged, in input order, into one CSV. With
+--per-shard they are kept as OUTPUT/<input>-<shard>.csv. --top-k adds the k
+most likely crops of every row with their calibrated probabilities. A per-worker
+throughput report is printed at the end (--report also writes it as JSON).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from io import BytesIO
+
+import pandas as pd
+
+# Default shard size, large enough to amortize task overhead, small enough to balance the workers
+DEFAULT_SHARD_BYTES = 16 * 1024 * 1024
+
+
+def plan_shards(path, shard_bytes=DEFAULT_SHARD_BYTES):
+    """Splits a CSV into byte ranges that start and end on line boundaries.
+    Args: CSV path, approximate shard size in bytes.
+    Returns: tuple of (header line, list of (path, start, end) byte ranges covering every data row).
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as csv_file:
+        header = csv_file.readline()
+        shards, start = [], csv_file.tell()
+        while start < size:
+            csv_file.seek(min(start + shard_bytes, size))
+            # Finish the line the cut landed in
+            csv_file.readline()
+            end = min(csv_file.tell(), size)
+            shards.append((path, start, end))
+            start = end
+    return header.decode(), shards
+
+
+_worker = {}
+
+
+def _init_worker():
+    """Loads the artifacts once per worker process."""
+    from threadpoolctl import threadpool_limits
+
+    from crop_artifacts import load_artifacts
+
+    start = time.perf_counter()
+    # Keep the limiter alive for the worker's lifetime; one BLAS thread per process
+    _worker['threadpool_limits'] = threadpool_limits(1)
+    load_artifacts()
+    _worker['load_seconds'] = time.perf_counter() - start
+
+
+def score_shard(task):
+    """Scores one shard in a worker and writes it as a headered CSV.
+    Args: tuple of (shard index, (path, start, end), header line, output path, batch size, top k).
+    Returns: dict with the shard's row count and timings.
+    """
+    from Intelligent_Crop_Selector import add_predicted_crop
+    from prediction_log import prediction_log
+
+    index, (path, start, end), header, output_path, batch_size, top_k = task
+    started = time.perf_counter()
+    with open(path, 'rb') as csv_file:
+        csv_file.seek(start)
+        data = pd.read_csv(BytesIO(header.encode() + csv_file.read(end - start)))
+    read_seconds = time.perf_counter() - started
+
+    step = time.perf_counter()
+    add_predicted_crop(data, batch_size, top_k)
+    score_seconds = time.perf_counter() - step
+    # Pool workers are terminated without running atexit handlers, so write the drift sketches now
+    prediction_log.flush()
+
+    step = time.perf_counter()
+    data.to_csv(output_path, index=False)
+    write_seconds = time.perf_counter() - step
+
+    return {
+        'shard': index,
+        'path': path,
+        'output': output_path,
+        'pid': os.getpid(),
+        'rows': len(data),
+        'load_seconds': _worker.get('load_seconds', 0.0),
+        'read_seconds': read_seconds,
+        'score_seconds': score_seconds,
+        'write_seconds': write_seconds,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def merge_shards(shard_paths, output_path):
+    """Concatenates scored shard files, in order, into one CSV with a single header."""
+    with open(output_path, 'wb') as output_file:
+        for i, shard_path in enumerate(shard_paths):
+            with open(shard_path, 'rb') as shard_file:
+                header = shard_file.readline()
+                if i == 0:
+                    output_file.write(header)
+                shutil.copyfileobj(shard_file, output_file)
+
+
+def worker_report(results):
+    """Summarizes shard results per worker process.
+    Returns: list of dicts with each worker's shards, rows, busy time and throughput.
+    """
+    workers = {}
+    for result in results:
+        worker = workers.setdefault(result['pid'], {'pid': result['pid'], 'shards': 0, 'rows': 0, 'busy_seconds': 0.0,
+                                                    'score_seconds': 0.0, 'load_seconds': result['load_seconds']})
+        worker['shards'] += 1
+        worker['rows'] += result['rows']
+        worker['busy_seconds'] += result['seconds']
+        worker['score_seconds'] += result['score_seconds']
+    for worker in workers.values():
+        worker['rows_per_second'] = worker['rows'] / worker['busy_seconds'] if worker['busy_seconds'] else 0.0
+    return sorted(workers.values(), key=lambda worker: worker['pid'])
+
+
+def score_files(paths, output, workers=None, shard_bytes=DEFAULT_SHARD_BYTES, per_shard=False, batch_size=None,
+                top_k=0):
+    """Scores CSV files across a process pool.
+    Args: input CSV paths, output CSV path (or directory with per_shard), number of worker
+    processes (default: every CPU), shard size in bytes, whether to keep one output per shard,
+    rows per model call, number of ranked crops to add per row (0 for none).
+    Returns: dict with the overall throughput, the per-worker report and the per-shard results.
+    """
+    from Intelligent_Crop_Selector import BATCH_SIZE, FEATURE_COLUMNS
+
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or BATCH_SIZE
+    shard_dir = output if per_shard else f'{output}.shards'
+    os.makedirs(shard_dir, exist_ok=True)
+
+    tasks, headers = [], set()
+    for path in paths:
+        header, shards = plan_shards(path, shard_bytes)
+        columns = pd.read_csv(BytesIO(header.encode()), nrows=0).columns
+        missing = [col for col in FEATURE_COLUMNS if col not in columns]
+        if missing:
+            raise ValueError(f"{path}: missing feature columns: {', '.join(missing)}")
+        headers.add(header)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for shard in shards:
+            tasks.append((len(tasks), shard, header, os.path.join(shard_dir, f'{stem}-{len(tasks):05d}.csv'),
+                          batch_size, top_k))
+    if not per_shard and len(headers) > 1:
+        raise ValueError("Inputs have different columns; use --per-shard to score them separately")
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        # Shards finish out of order; the merge below restores the input order
+        results = sorted(pool.imap_unordered(score_shard, tasks), key=lambda result: result['shard'])
+    score_seconds = time.perf_counter() - start
+
+    if not per_shard:
+        merge_shards([result['output'] for result in results], output)
+        shutil.rmtree(shard_dir)
+    total_seconds = time.perf_counter() - start
+
+    rows = sum(result['rows'] for result in results)
+    return {
+        'workers': workers,
+        'shards': len(results),
+        'rows': rows,
+        'score_seconds': score_seconds,
+        'total_seconds': total_seconds,
+        'rows_per_second': rows / total_seconds if total_seconds else 0.0,
+        'per_worker': worker_report(results),
+        'per_shard': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help="CSV files laid out like data/304_dataset.csv")
+    parser.add_argument('--output', required=True, help="Output CSV, or directory with --per-shard")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_BYTES, help="Approximate shard size in bytes")
+    parser.add_argument('--per-shard', action='store_true', help="Keep one output file per shard")
+    parser.add_argument('--batch-size', type=int, help="Rows per model call")
+    parser.add_argument('--top-k', type=int, default=0, help="Add the k most likely crops with probabilities per row")
+    parser.add_argument('--report', help="Also write the throughput report to this JSON file")
+    args = parser.parse_args()
+
+    summary = score_files(args.inputs, args.output, args.workers, args.shard_size, args.per_shard, args.batch_size,
+                          args.top_k)
+
+    print(f"{'worker':>8} {'shards':>7} {'rows':>12} {'load s':>8} {'busy s':>8} {'rows/s':>12}")
+    for worker in summary['per_worker']:
+        print(f"{worker['pid']:>8} {worker['shards']:>7} {worker['rows']:>12,} {worker['load_seconds']:>8.2f} "
+              f"{worker['busy_seconds']:>8.2f} {worker['rows_per_second']:>12,.0f}")
+    print(f"Scored {summary['rows']:,} rows in {summary['shards']} shard(s) with {summary['workers']} worker(s): "
+          f"{summary['total_seconds']:.2f} s, {summary['rows_per_second']:,.0f} rows/s")
+    print(f"Wrote {args.output}")
+
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(summary, report_file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
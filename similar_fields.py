@@ -0,0 +1,105 @@
+"""Nearest-neighbour index over the historical crop records.
+
+A KD-tree is built once over the cleaned dataset, standardized with the same
+scaler.pkl transform the model uses, and pickled next to the model artifacts
+as similar_fields_index.pkl. It is rebuilt only when the dataset or the
+scaler changes. Queries return the top-k most similar historical fields with
+their labels and distances, for one input or a whole batch.
+"""
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from crop_artifacts import BASE_DIR, SCALER_PATH, load_artifacts
+from crop_data import DATA_PATH, FEATURES, load_crop_data, load_info
+
+INDEX_PATH = os.path.join(BASE_DIR, 'similar_fields_index.pkl')
+
+# Number of similar fields returned by default
+DEFAULT_K = 5
+
+
+class SimilarFieldsIndex:
+    """KD-tree over standardized historical feature vectors."""
+
+    def __init__(self, tree, features, labels, row_index, fingerprint):
+        self.tree = tree
+        self.features = features
+        self.labels = labels
+        self.row_index = row_index
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, crop_data, scaler, fingerprint=None):
+        """Builds the index from cleaned crop data and the fitted scaler."""
+        features = crop_data[FEATURES].to_numpy(dtype=np.float64)
+        tree = KDTree(scaler.transform(features))
+        return cls(tree, features.astype(np.float32), crop_data['label'].astype(str).to_numpy(),
+                   crop_data.index.to_numpy(), fingerprint)
+
+    def query(self, input_data, k=DEFAULT_K, scaler=None):
+        """Finds the k most similar historical fields for each input row.
+        Args: raw features of shape (7,) or (n_rows, 7), number of neighbours, scaler (defaults to
+        the shared one).
+        Returns: tuple of (indices, distances, labels), each of shape (n_rows, k); indices point
+        into self.features, distances are in standardized units.
+        """
+        scaler = scaler or load_artifacts().scaler
+        input_data = np.atleast_2d(np.asarray(input_data, dtype=np.float64))
+        k = min(k, len(self.labels))
+        distances, indices = self.tree.query(scaler.transform(input_data), k=k)
+        return indices, distances, self.labels[indices]
+
+    def similar_fields(self, features, k=DEFAULT_K):
+        """Returns the k most similar historical records for one input as a pd.DataFrame."""
+        indices, distances, labels = self.query(features, k)
+        records = pd.DataFrame(self.features[indices[0]], columns=FEATURES)
+        records.insert(0, 'label', labels[0])
+        records['distance'] = distances[0]
+        records.index = pd.Index(self.row_index[indices[0]], name='record')
+        return records
+
+
+def _fingerprint():
+    # The index depends on the cleaned data and on the scaler used to standardize it
+    scaler_stat = os.stat(SCALER_PATH)
+    return load_info['sha256'], scaler_stat.st_size, scaler_stat.st_mtime_ns
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def load_similar_fields_index(path=INDEX_PATH):
+    """Returns the shared index, loading it from disk or rebuilding it when it is stale."""
+    global _index
+    crop_data = load_crop_data(DATA_PATH)
+    fingerprint = _fingerprint()
+    if _index is not None and _index.fingerprint == fingerprint:
+        return _index
+
+    with _lock:
+        if _index is not None and _index.fingerprint == fingerprint:
+            return _index
+        index = None
+        try:
+            with open(path, 'rb') as index_file:
+                index = pickle.load(index_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+
+        if index is None or index.fingerprint != fingerprint:
+            index = SimilarFieldsIndex.build(crop_data, load_artifacts().scaler, fingerprint)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp_path, 'wb') as index_file:
+                    pickle.dump(index, index_file)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+        _index = index
+    return _index
@@ -0,0 +1,183 @@
+"""Out-of-core ingestion of sensor CSVs larger than memory.
+
+Usage: python streaming_ingest.py INPUT.csv OUTPUT_DIR [--chunk-size 100000] [--dedup bloom|hash]
+
+The input is read in chunks, each cleaned like clean_crop_data, and
+deduplicated across the whole file with either a fixed-size Bloom filter
+(default, memory set by --expected-rows and --error-rate, may drop a
+fraction --error-rate of unique rows) or an exact set of 64-bit row hashes.
+Cleaned rows are written as Parquet partitioned by label:
+
+    OUTPUT_DIR/label=<crop>/part-<chunk>.parquet
+
+Per-label count, mean, min, max, quartiles and covariance moments are
+updated incrementally in a CropSummaryCube, the quartiles as mergeable
+sketches, and written to OUTPUT_DIR/_summary.json (the leading underscore
+keeps Parquet readers from treating it as data).
+Peak memory depends on the chunk size and the dedup structure, not on the
+size of the input file.
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from crop_data import FEATURES, clean_crop_data
+from crop_summary import CropSummaryCube
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Rough size of one raw CSV row, used to size the Bloom filter from the file size
+BYTES_PER_ROW_ESTIMATE = 48
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set of 64-bit hashes, queried and updated in batches."""
+
+    def __init__(self, capacity, error_rate=1e-4):
+        # Optimal bit count and number of hash functions for the target false-positive rate
+        self.n_bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * math.log(2))))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def _positions(self, hashes):
+        # Double hashing: position_i = h1 + i * h2, with both halves taken from one 64-bit hash
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.n_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.n_bits)
+
+    def add_new(self, hashes):
+        """Adds a batch of distinct hashes and reports which ones were (probably) new.
+        Returns: boolean array, True where the hash had not been seen before.
+        """
+        positions = self._positions(hashes)
+        byte_index, bit = positions // np.uint64(8), (positions % np.uint64(8)).astype(np.uint8)
+        seen = ((self.bits[byte_index] >> bit) & 1).all(axis=1)
+        np.bitwise_or.at(self.bits, byte_index[~seen].ravel(), (np.uint8(1) << bit[~seen]).ravel())
+        return ~seen
+
+
+class HashSet:
+    """Exact set of 64-bit row hashes, for when dropping any unique row is unacceptable."""
+
+    def __init__(self):
+        self.hashes = set()
+
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self.hashes) + 32 * len(self.hashes)
+
+    def add_new(self, hashes):
+        is_new = np.fromiter((h not in self.hashes for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        self.hashes.update(hashes[is_new].tolist())
+        return is_new
+
+
+def clean_chunk(chunk, seen):
+    """Cleans one raw chunk and drops rows already seen in earlier chunks.
+    Args: raw pd.DataFrame chunk, BloomFilter or HashSet shared across chunks.
+    Returns: cleaned pd.DataFrame with float32 features, so every partition has the same schema.
+    """
+    # read_csv guesses dtypes per chunk (int64 here, float64 where a NaN was read), and equal values
+    # of different dtypes hash differently, so fix the dtypes before hashing
+    chunk = clean_crop_data(chunk).astype({feature: np.float32 for feature in FEATURES})
+    # Hash the cleaned values, so rows that differ only beyond 4 decimals count as duplicates
+    hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    return chunk[seen.add_new(hashes)]
+
+
+def write_partitions(chunk, output_dir, part):
+    """Writes one cleaned chunk as Parquet files partitioned by label."""
+    for label, rows in chunk.groupby('label', sort=False):
+        partition_dir = os.path.join(output_dir, f'label={label}')
+        os.makedirs(partition_dir, exist_ok=True)
+        rows.drop(columns='label').to_parquet(os.path.join(partition_dir, f'part-{part:05d}.parquet'), index=False)
+
+
+def ingest(input_path, output_dir, chunk_size=DEFAULT_CHUNK_SIZE, dedup='bloom', expected_rows=None,
+           error_rate=1e-4, progress=None):
+    """Streams a raw crop CSV into cleaned, partitioned Parquet and running aggregates.
+    Args: raw CSV path, output directory, rows per chunk, 'bloom' or 'hash' deduplication,
+    expected number of rows and false-positive rate for the Bloom filter, optional callback
+    called with a stats dict after every chunk.
+    Returns: tuple of (CropSummaryCube of the cleaned rows, stats dict).
+    """
+    if dedup == 'bloom':
+        expected_rows = expected_rows or max(1_000_000, os.path.getsize(input_path) // BYTES_PER_ROW_ESTIMATE)
+        seen = BloomFilter(expected_rows, error_rate)
+    elif dedup == 'hash':
+        seen = HashSet()
+    else:
+        raise ValueError(f"Unknown dedup method: {dedup}")
+
+    # The cube's quantiles are mergeable sketches, so they stay bounded however large the input
+    summary = CropSummaryCube()
+    stats = {'chunks': 0, 'rows_read': 0, 'rows_written': 0}
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+
+    for part, chunk in enumerate(pd.read_csv(input_path, chunksize=chunk_size)):
+        stats['rows_read'] += len(chunk)
+        chunk = clean_chunk(chunk, seen)
+        if len(chunk):
+            write_partitions(chunk, output_dir, part)
+            summary.append(chunk)
+        stats['chunks'] += 1
+        stats['rows_written'] += len(chunk)
+        if progress is not None:
+            progress(dict(stats))
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_second'] = stats['rows_read'] / stats['seconds'] if stats['seconds'] else 0.0
+    stats['dedup_bytes'] = seen.nbytes
+    # ru_maxrss is in kilobytes on Linux
+    stats['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return summary, stats
+
+
+def write_summary(summary, stats, output_dir):
+    """Writes the per-label aggregates and the run statistics to _summary.json."""
+    labels = {}
+    for label in summary.labels:
+        table = summary.table(label)
+        labels[label] = {stat: table.loc[stat].round(6).to_dict() for stat in summary.stat_names[1:]}
+        labels[label]['count'] = summary.count(label)
+    with open(os.path.join(output_dir, '_summary.json'), 'w') as summary_file:
+        json.dump({'stats': stats, 'labels': labels}, summary_file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input')
+    parser.add_argument('output_dir')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--dedup', choices=['bloom', 'hash'], default='bloom')
+    parser.add_argument('--expected-rows', type=int, help="Bloom filter capacity (default: estimated from file size)")
+    parser.add_argument('--error-rate', type=float, default=1e-4, help="Bloom filter false-positive rate")
+    args = parser.parse_args()
+
+    def progress(stats):
+        print(f"chunk {stats['chunks']:,}: {stats['rows_read']:,} rows read, {stats['rows_written']:,} written",
+              file=sys.stderr)
+
+    summary, stats = ingest(args.input, args.output_dir, args.chunk_size, args.dedup, args.expected_rows,
+                            args.error_rate, progress)
+    write_summary(summary, stats, args.output_dir)
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Keep test predictions out of the drift monitor's log
+os.environ.setdefault('CROP_PREDICTION_LOG', '0')
@@ -0,0 +1,34 @@
+import numpy as np
+
+from crop_charts import lttb_downsample, minmax_downsample
+
+
+def test_lttb_downsample_keeps_ends_and_spikes():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0
+
+    sampled_x, sampled_y = lttb_downsample(x, y, 200)
+
+    assert len(sampled_x) == 200
+    assert sampled_x[0] == 0 and sampled_x[-1] == 9_999
+    assert np.all(np.diff(sampled_x) > 0)
+    assert 4321 in sampled_x
+    np.testing.assert_array_equal(sampled_y, y[sampled_x])
+    # Short series are returned as they are
+    assert len(lttb_downsample(x[:100], y[:100], 200)[0]) == 100
+
+
+def test_minmax_downsample_keeps_every_bucket_extreme():
+    rng = np.random.default_rng(3)
+    x = np.arange(10_001)
+    y = rng.normal(size=len(x))
+    y[777], y[8888] = 100.0, -100.0
+
+    sampled_x, sampled_y = minmax_downsample(x, y, 200)
+
+    assert len(sampled_x) <= 200
+    assert np.all(np.diff(sampled_x) > 0)
+    assert {777, 8888} <= set(sampled_x)
+    assert sampled_y.max() == 100.0 and sampled_y.min() == -100.0
+    np.testing.assert_array_equal(sampled_y, y[sampled_x])
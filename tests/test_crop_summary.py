@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from crop_summary import FeatureMoments
+
+
+def test_feature_moments_match_dataframe_corr():
+    rng = np.random.default_rng(2)
+    frame = pd.DataFrame(rng.normal(size=(1000, 4)) @ rng.normal(size=(4, 4)) + 1e4, columns=list('abcd'))
+
+    moments = FeatureMoments(4)
+    for batch in np.array_split(frame.to_numpy(), 7):
+        moments.update(batch)
+    merged = FeatureMoments.from_values(frame.iloc[:300])
+    merged.merge(FeatureMoments.from_values(frame.iloc[300:]))
+
+    assert moments.count == merged.count == 1000
+    for result in (moments, merged):
+        np.testing.assert_allclose(result.correlation(), frame.corr().to_numpy(), atol=1e-10)
+        np.testing.assert_allclose(result.covariance(), frame.cov().to_numpy(), rtol=1e-9)
+        np.testing.assert_allclose(result.mean, frame.mean().to_numpy(), rtol=1e-12)
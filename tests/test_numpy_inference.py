@@ -0,0 +1,79 @@
+"""Checks for the NumPy inference engine, run with `python -m pytest tests`.
+
+Only test_numpy_matches_keras imports TensorFlow, and it is skipped where tf_keras is not installed.
+"""
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from crop_artifacts import LABEL_ENCODER_PATH, MODEL_PATH, NUMPY_MODEL_PATH, SCALER_PATH, model_sha256
+from crop_data import DATA_PATH
+from numpy_inference import NumpyCropModel, dequantize, fold_scaler, quantize_int8
+
+# Rows of data/304_dataset.csv (after dropna), with the crop and top probability of the bundled model
+GOLDEN_MODEL_SHA256 = 'ffe88e1b4a1d18159bd8ec4056ce81ab1e3d4acf1e4b4985627192a2e67d9079'
+GOLDEN_ROWS = [0, 500, 1000, 1500, 2000]
+GOLDEN_CROPS = ['Carrots', 'grapes', 'coffee', 'chickpea', 'tomato']
+GOLDEN_TOP_PROBABILITIES = [0.9999009, 0.9999650, 1.0, 0.9880533, 0.9999819]
+
+
+def test_fold_scaler_matches_scaler_then_matmul():
+    rng = np.random.default_rng(0)
+    features = rng.normal([100, 50, 150, 25, 70, 6.5, 200], [50, 30, 60, 5, 15, 0.5, 100], size=(200, 7))
+    scaler = StandardScaler().fit(features)
+    kernels = [rng.normal(size=(7, 16)), rng.normal(size=(16, 4))]
+    biases = [rng.normal(size=16), rng.normal(size=4)]
+
+    folded_kernels, folded_biases = fold_scaler(kernels, biases, scaler.mean_, scaler.scale_)
+
+    expected = scaler.transform(features) @ kernels[0] + biases[0]
+    np.testing.assert_allclose(features @ folded_kernels[0] + folded_biases[0], expected, rtol=1e-9, atol=1e-9)
+    # Only the first layer changes
+    assert folded_kernels[1] is kernels[1] and folded_biases[1] is biases[1]
+
+
+def test_quantize_int8_round_trip():
+    rng = np.random.default_rng(1)
+    # Rows of very different magnitude, like the folded first layer
+    kernel = rng.normal(size=(7, 32)) * np.array([1e-3, 1e-2, 1e-1, 1, 10, 100, 1e3])[:, None]
+
+    quantized, row_scale, scale = quantize_int8(kernel)
+
+    assert quantized.dtype == np.int8 and row_scale.shape == (7, 1) and scale.shape == (32,)
+    restored = dequantize(quantized, row_scale, scale)
+    assert restored.dtype == np.float32
+    # Rounding is off by at most half a step of each element's own scale
+    step = row_scale * scale
+    assert np.all(np.abs(restored - kernel) <= step * 0.5 + np.abs(kernel) * 1e-6)
+
+
+def test_numpy_engine_golden_output():
+    if model_sha256() != GOLDEN_MODEL_SHA256:
+        pytest.skip("The bundled model changed; record new golden outputs for it")
+    with open(LABEL_ENCODER_PATH, 'rb') as label_encoder_file:
+        label_encoder = np.asarray(pickle.load(label_encoder_file))
+    rows = pd.read_csv(DATA_PATH).dropna().iloc[GOLDEN_ROWS, :7].to_numpy(dtype=float)
+
+    predictions = NumpyCropModel.load(NUMPY_MODEL_PATH).predict(rows)
+
+    assert predictions.shape == (len(GOLDEN_ROWS), 24)
+    np.testing.assert_allclose(predictions.sum(axis=1), 1.0, rtol=1e-5)
+    assert list(label_encoder[predictions.argmax(axis=1)]) == GOLDEN_CROPS
+    np.testing.assert_allclose(predictions.max(axis=1), GOLDEN_TOP_PROBABILITIES, atol=1e-6)
+
+
+def test_numpy_matches_keras():
+    keras = pytest.importorskip('tf_keras')
+    from export_numpy_model import check_parity
+
+    with open(SCALER_PATH, 'rb') as scaler_file:
+        scaler = pickle.load(scaler_file)
+
+    max_difference, agreement = check_parity(keras.models.load_model(MODEL_PATH), scaler,
+                                             NumpyCropModel.load(NUMPY_MODEL_PATH), DATA_PATH)
+
+    assert max_difference < 1e-4
+    assert agreement == 1.0
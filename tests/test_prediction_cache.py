@@ -0,0 +1,46 @@
+import time
+
+import crop_artifacts
+from prediction_cache import PredictionCache
+
+
+def test_prediction_cache_lru_eviction():
+    cache = PredictionCache(maxsize=2, precision=(0,) * 7)
+    calls = []
+
+    def compute(value):
+        return lambda: calls.append(value) or value
+
+    cache.get_or_compute([1] * 7, compute('a'))
+    cache.get_or_compute([2] * 7, compute('b'))
+    # A hit makes row 1 the most recently used, so row 2 is evicted next
+    assert cache.get_or_compute([1.2] * 7, compute('x')) == 'a'
+    cache.get_or_compute([3] * 7, compute('c'))
+    assert cache.get_or_compute([2] * 7, compute('b2')) == 'b2'
+
+    assert calls == ['a', 'b', 'c', 'b2']
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 4 and stats['evictions'] == 2 and stats['size'] == 2
+
+
+def test_prediction_cache_ttl_expiry():
+    cache = PredictionCache(maxsize=8, ttl=0.05)
+
+    assert cache.get_or_compute([1] * 7, lambda: 'first') == 'first'
+    assert cache.get_or_compute([1] * 7, lambda: 'second') == 'first'
+    time.sleep(0.1)
+    assert cache.get_or_compute([1] * 7, lambda: 'third') == 'third'
+    assert cache.stats()['expirations'] == 1
+
+
+def test_prediction_cache_invalidates_on_artifact_change(monkeypatch):
+    fingerprint = ['v1']
+    monkeypatch.setattr(crop_artifacts, 'artifact_fingerprint', lambda: fingerprint[0])
+    monkeypatch.setattr(crop_artifacts, 'reload_artifacts', lambda: None)
+    cache = PredictionCache(maxsize=8, check_interval=0)
+
+    cache.get_or_compute([1] * 7, lambda: 'old model')
+    assert cache.get_or_compute([1] * 7, lambda: 'unused') == 'old model'
+    fingerprint[0] = 'v2'
+    assert cache.get_or_compute([1] * 7, lambda: 'new model') == 'new model'
+    assert cache.stats()['invalidations'] == 1
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import prediction_log
+from crop_data import DATA_PATH, FEATURES, load_crop_data
+from prediction_log import (DRIFT_WINDOW_SECONDS, LOG_RETENTION, WINDOW_SECONDS, PredictionLog, compact_log, drift_report,
+                            load_merged)
+
+START = 1_800_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [START]
+    monkeypatch.setattr(prediction_log.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def training_rows():
+    return load_crop_data(DATA_PATH)[FEATURES].to_numpy(dtype=np.float64)
+
+
+def log_rows(path, rows, process):
+    log = PredictionLog(path=str(path), flush_interval=3600)
+    log.process = process
+    log.record_batch(rows, np.zeros(len(rows), dtype=np.int64))
+    log.flush()
+    return log
+
+
+def test_compaction_folds_every_process_into_its_window(tmp_path, clock, training_rows):
+    path = tmp_path / 'log.jsonl'
+    for i in range(30):
+        # Ten short-lived processes an hour for three hours, each writing two lines
+        clock[0] = START + i * WINDOW_SECONDS / 10
+        log = log_rows(path, training_rows[:100], f'process-{i}')
+        log.record_batch(training_rows[100:150], np.ones(50, dtype=np.int64))
+        log.flush()
+    before_sketches, before_crops, windows = load_merged(str(path))
+
+    compact_log(str(path))
+
+    assert len(path.read_text().splitlines()) == windows == 3
+    sketches, crops, _ = load_merged(str(path))
+    assert crops == before_crops and sum(crops.values()) == 30 * 150
+    for feature in FEATURES:
+        assert sketches[feature].n == before_sketches[feature].n == 30 * 150
+    # A process still running keeps adding lines, and they only hold what is new since its last one
+    log.record_batch(training_rows[:10], np.zeros(10, dtype=np.int64))
+    log.flush()
+    assert sum(load_merged(str(path))[1].values()) == 30 * 150 + 10
+
+
+def test_drift_report_scores_recent_traffic(tmp_path, clock, training_rows):
+    path = tmp_path / 'log.jsonl'
+    log_rows(path, training_rows, 'old')
+    # Far more old traffic like the training data than recent traffic, which has shifted
+    clock[0] = START + 2 * DRIFT_WINDOW_SECONDS
+    log_rows(path, training_rows[:200] * 3, 'recent')
+
+    report = drift_report(str(path), max_age=0)
+
+    assert report['predictions'] == 200
+    assert set(report['drifted']) == set(FEATURES)
+    assert drift_report(str(path), max_age=0, window=4 * DRIFT_WINDOW_SECONDS)['predictions'] == len(training_rows) + 200
+
+
+def test_compaction_drops_windows_past_retention(tmp_path, clock, training_rows):
+    path = tmp_path / 'log.jsonl'
+    log_rows(path, training_rows[:100], 'old')
+    clock[0] = START + LOG_RETENTION + 2 * WINDOW_SECONDS
+    log_rows(path, training_rows[:10], 'recent')
+
+    compact_log(str(path))
+
+    assert len(path.read_text().splitlines()) == 1
+    assert sum(load_merged(str(path))[1].values()) == 10
+
@@ -0,0 +1,23 @@
+import numpy as np
+
+from quantile_sketch import KLLSketch
+
+
+def test_kll_sketch_rank_error():
+    rng = np.random.default_rng(4)
+    values = rng.lognormal(size=200_000)
+    sketch, left, right = KLLSketch(seed=0), KLLSketch(seed=1), KLLSketch(seed=2)
+    for batch in np.array_split(values, 40):
+        sketch.update(batch)
+    left.update(values[:50_000])
+    right.update(values[50_000:])
+    merged = left.merge(right)
+
+    sorted_values = np.sort(values)
+    quantiles = np.linspace(0.01, 0.99, 99)
+    for estimate in (sketch, merged):
+        assert estimate.n == len(values)
+        ranks = np.searchsorted(sorted_values, estimate.quantile(quantiles)) / len(values)
+        assert np.abs(ranks - quantiles).max() < 0.02
+    # O(k) items, not O(n)
+    assert sum(len(level) for level in sketch.levels) < 1000
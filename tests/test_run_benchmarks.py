@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from run_benchmarks import BASELINE_PATH, DEFAULT_THRESHOLD, UNGATED_METRICS, compare  # noqa: E402
+
+
+@pytest.fixture
+def baseline():
+    with open(BASELINE_PATH) as baseline_file:
+        return json.load(baseline_file)['metrics']
+
+
+def slowed_down(metrics, factor, names=None):
+    """Returns metrics as if the named ones (default: all but the reference) ran factor times slower."""
+    slowed = dict(metrics)
+    for name in names or [name for name in metrics if name != 'reference_seconds']:
+        slowed[name] = metrics[name] / factor if name.endswith('_per_second') else metrics[name] * factor
+    return slowed
+
+
+def test_unchanged_metrics_pass(baseline):
+    assert compare(baseline, baseline, threshold=DEFAULT_THRESHOLD) == []
+
+
+def test_twice_as_slow_single_prediction_fails(baseline):
+    regressions = compare(slowed_down(baseline, 2.0, ['predict_crop_p50_seconds']), baseline, threshold=DEFAULT_THRESHOLD)
+
+    assert len(regressions) == 1 and regressions[0].startswith('predict_crop_p50_seconds')
+
+
+@pytest.mark.parametrize('factor', [2.0, 4.0])
+def test_uniform_slowdown_flags_every_gated_metric(baseline, factor):
+    regressions = compare(slowed_down(baseline, factor), baseline, threshold=DEFAULT_THRESHOLD)
+
+    gated = [name for name in baseline if name not in UNGATED_METRICS]
+    assert sorted(message.split(':')[0] for message in regressions) == sorted(gated)
+
+
+def test_slower_machine_is_not_a_regression(baseline):
+    slower_machine = slowed_down(baseline, 3.0, list(baseline))
+
+    assert compare(slower_machine, baseline, threshold=DEFAULT_THRESHOLD) == []
+
+
+def test_faster_machine_does_not_scale_times_up(baseline):
+    faster_machine = dict(baseline, reference_seconds=baseline['reference_seconds'] / 2)
+
+    assert compare(faster_machine, baseline, threshold=DEFAULT_THRESHOLD) == []
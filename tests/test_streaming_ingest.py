@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pytest
+
+from streaming_ingest import BloomFilter, ingest, write_summary
+
+HEADER = 'Nitrogen(pmm),Phosphorus(pmm),Potassium(mm),temperature(F),humidity,soil_ph,rainfall(mm),label\n'
+ROW_A = '113,7,211,18.08510649,89.54547331,5.712243236,851.3911944,Carrots\n'
+ROW_B = '179,55,157,26.27751195,86.71060271,6.518869088,449.8720522,onions\n'
+ROW_NAN = ',55,157,26.27751195,86.71060271,6.518869088,449.8720522,onions\n'
+
+
+def test_bloom_filter():
+    rng = np.random.default_rng(5)
+    hashes = rng.integers(0, 2 ** 63, size=20_000, dtype=np.uint64)
+    bloom = BloomFilter(capacity=20_000, error_rate=1e-4)
+
+    first, second = hashes[:10_000], hashes[10_000:]
+    assert bloom.add_new(first).all()
+    # No false negatives: every added hash is seen again
+    assert not bloom.add_new(first).any()
+    # Fresh hashes are almost all reported new
+    assert bloom.add_new(second).mean() > 0.999
+
+
+@pytest.mark.parametrize('dedup', ['bloom', 'hash'])
+def test_duplicates_found_across_chunks_of_different_dtypes(tmp_path, dedup):
+    # With two rows per chunk, the NaN makes read_csv give the second chunk float64 features, the first int64
+    csv_path = tmp_path / 'sensors.csv'
+    csv_path.write_text(HEADER + ROW_A + ROW_B + ROW_NAN + ROW_A)
+
+    summary, stats = ingest(str(csv_path), str(tmp_path / 'out'), chunk_size=2, dedup=dedup, expected_rows=1000)
+
+    assert stats['chunks'] == 2 and stats['rows_read'] == 4
+    assert stats['rows_written'] == 2
+    assert summary.count('Carrots') == 1 and summary.count('onions') == 1
+
+
+def test_summary_keeps_quartiles(tmp_path):
+    csv_path = tmp_path / 'sensors.csv'
+    csv_path.write_text(HEADER + ROW_A + ROW_B)
+    output_dir = tmp_path / 'out'
+
+    summary, stats = ingest(str(csv_path), str(output_dir), chunk_size=1, dedup='hash')
+    write_summary(summary, stats, str(output_dir))
+
+    with open(output_dir / '_summary.json') as summary_file:
+        carrots = json.load(summary_file)['labels']['Carrots']
+    assert carrots['p50']['nitrogen_pmm'] == pytest.approx(113)
+    assert carrots['count'] == 1
@@ -0,0 +1,57 @@
+"""TensorFlow Lite runtime for the quantized Intelligent_Crop_Selector variants.
+
+The .tflite files come from quantize_model.py. They expect standardized
+features, like the SavedModel they were converted from. The interpreter is
+taken from the standalone LiteRT or tflite_runtime packages when one is
+installed, so a replica does not need to import all of TensorFlow, and from
+tensorflow.lite otherwise.
+"""
+import threading
+
+import numpy as np
+
+
+def _load_interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteCropModel:
+    """Dense classifier evaluated with the TFLite interpreter."""
+
+    def __init__(self, path):
+        self.path = path
+        self.interpreter = _load_interpreter_class()(model_path=path)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+        # One interpreter holds one set of tensors, so calls from several threads take turns
+        self._lock = threading.Lock()
+
+    @property
+    def n_classes(self):
+        return int(self._output['shape'][-1])
+
+    def predict(self, input_data):
+        """Runs the model on standardized features.
+        Args: array-like of shape (n_rows, 7).
+        Returns: np.ndarray of shape (n_rows, n_classes) with class probabilities.
+        """
+        input_data = np.ascontiguousarray(input_data, dtype=np.float32)
+        with self._lock:
+            if self._batch_size != len(input_data):
+                # Resizing reallocates every tensor, so only do it when the batch size changes
+                self.interpreter.resize_tensor_input(self._input['index'], input_data.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(input_data)
+            self.interpreter.set_tensor(self._input['index'], input_data)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output['index']).copy()
@@ -0,0 +1,270 @@
+"""Rebuilds the crop model, scaler and label encoder from the dataset.
+
+Usage: python train_model.py [--data PATH] [--output-dir artifacts] [--install]
+
+--data is the raw CSV (default data/304_dataset.csv, read through the cleaned
+Parquet cache) or cleaned Parquet, such as a streaming_ingest.py output
+directory. Each run writes a versioned bundle:
+
+    artifacts/<version>/
+        Intelligent_Crop_Selector/      Keras SavedModel
+        Intelligent_Crop_Selector.npz   NumPy weights with the scaler folded in
+        scaler.pkl                      StandardScaler fitted on the training split
+        label_encoder.pkl               numpy array of class names, in output order
+        manifest.json                   data and file hashes, accuracy, training time
+
+--install copies the bundle over the live artifacts next to the app. Runs with
+the same data, seed and settings give the same splits and weights: seeds are
+fixed, and TensorFlow op determinism is enabled.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import platform
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from crop_artifacts import BASE_DIR, LABEL_ENCODER_PATH, MODEL_PATH, NUMPY_MODEL_PATH, SCALER_PATH, import_keras
+from crop_data import DATA_PATH, FEATURES, file_sha256, load_crop_data, load_info
+from export_numpy_model import export_model
+
+ARTIFACTS_DIR = os.path.join(BASE_DIR, 'artifacts')
+
+# Bundle file names, the same as the live artifacts so a bundle can be installed as is
+BUNDLE_FILES = {
+    'model': os.path.basename(MODEL_PATH),
+    'numpy_model': os.path.basename(NUMPY_MODEL_PATH),
+    'scaler': os.path.basename(SCALER_PATH),
+    'label_encoder': os.path.basename(LABEL_ENCODER_PATH),
+}
+
+DEFAULT_CONFIG = {
+    'seed': 42,
+    'epochs': 200,
+    'batch_size': 32,
+    'learning_rate': 1e-3,
+    'patience': 15,
+    'validation_fraction': 0.15,
+    'test_fraction': 0.15,
+    'hidden_units': [128, 64],
+}
+
+
+def load_training_data(path=DATA_PATH):
+    """Loads cleaned crop data from a raw CSV or from cleaned Parquet.
+    Returns: tuple of (pd.DataFrame with FEATURES and label, SHA-256 of the source).
+    """
+    if os.path.isdir(path) or path.endswith('.parquet'):
+        crop_data = pd.read_parquet(path)
+        # Hash every Parquet file, in a stable order, so the manifest identifies the data
+        paths = [path] if os.path.isfile(path) else sorted(
+            os.path.join(root, name) for root, _, files in os.walk(path) for name in files if name.endswith('.parquet'))
+        sha256 = hashlib.sha256(''.join(file_sha256(part) for part in paths).encode()).hexdigest()
+    else:
+        crop_data = load_crop_data(path)
+        sha256 = load_info['sha256']
+    crop_data = crop_data[FEATURES + ['label']].dropna()
+    crop_data = crop_data.assign(label=crop_data['label'].astype(str))
+    return crop_data, sha256
+
+
+def split_data(crop_data, config):
+    """Makes stratified train, validation and test splits.
+    Returns: dict of split name to (features, label codes), and the sorted class names.
+    """
+    classes, codes = np.unique(crop_data['label'].to_numpy(), return_inverse=True)
+    features = crop_data[FEATURES].to_numpy(dtype=np.float64)
+    holdout = config['validation_fraction'] + config['test_fraction']
+    x_train, x_rest, y_train, y_rest = train_test_split(
+        features, codes, test_size=holdout, stratify=codes, random_state=config['seed'])
+    x_val, x_test, y_val, y_test = train_test_split(
+        x_rest, y_rest, test_size=config['test_fraction'] / holdout, stratify=y_rest, random_state=config['seed'])
+    return {'train': (x_train, y_train), 'validation': (x_val, y_val), 'test': (x_test, y_test)}, classes
+
+
+def configure_tensorflow(seed):
+    """Seeds every random generator, makes ops deterministic and uses all CPU cores.
+    Returns: tuple of (tensorflow module, Keras 2 module from import_keras).
+    """
+    import tensorflow as tf
+
+    keras = import_keras()
+    keras.utils.set_random_seed(seed)
+    tf.config.experimental.enable_op_determinism()
+    cores = os.cpu_count() or 1
+    tf.config.threading.set_intra_op_parallelism_threads(cores)
+    tf.config.threading.set_inter_op_parallelism_threads(cores)
+    return tf, keras
+
+
+def make_dataset(tf, features, labels, batch_size, shuffle_seed=None):
+    """Builds a cached, prefetched tf.data pipeline over in-memory arrays."""
+    dataset = tf.data.Dataset.from_tensor_slices((features.astype(np.float32), labels.astype(np.int32))).cache()
+    if shuffle_seed is not None:
+        dataset = dataset.shuffle(len(features), seed=shuffle_seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def build_model(keras, n_classes, config):
+    """Dense softmax classifier over the seven standardized features."""
+    layers = [keras.layers.Input(shape=(len(FEATURES),))]
+    layers += [keras.layers.Dense(units, activation='relu') for units in config['hidden_units']]
+    layers.append(keras.layers.Dense(n_classes, activation='softmax'))
+    model = keras.Sequential(layers)
+    model.compile(optimizer=keras.optimizers.Adam(config['learning_rate']),
+                  loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def train(crop_data, config=None, verbose=0):
+    """Fits the scaler and the model on cleaned crop data.
+    Returns: tuple of (Keras model, StandardScaler, class names, metrics dict).
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    tf, keras = configure_tensorflow(config['seed'])
+    splits, classes = split_data(crop_data, config)
+
+    # Fit the scaler on the training split only, on plain arrays like the app passes at inference time
+    scaler = StandardScaler().fit(splits['train'][0])
+    scaled = {name: (scaler.transform(x), y) for name, (x, y) in splits.items()}
+
+    train_dataset = make_dataset(tf, *scaled['train'], config['batch_size'], shuffle_seed=config['seed'])
+    validation_dataset = make_dataset(tf, *scaled['validation'], config['batch_size'])
+
+    model = build_model(keras, len(classes), config)
+    early_stopping = keras.callbacks.EarlyStopping(
+        monitor='val_loss', patience=config['patience'], restore_best_weights=True)
+
+    start = time.perf_counter()
+    history = model.fit(train_dataset, validation_data=validation_dataset, epochs=config['epochs'],
+                        callbacks=[early_stopping], verbose=verbose)
+    training_seconds = time.perf_counter() - start
+
+    metrics = {'training_seconds': round(training_seconds, 3), 'epochs_trained': len(history.history['loss'])}
+    for name, (x, y) in scaled.items():
+        predictions = model.predict(x, batch_size=8192, verbose=0).argmax(axis=1)
+        metrics[f'{name}_accuracy'] = round(float((predictions == y).mean()), 6)
+        metrics[f'{name}_rows'] = int(len(y))
+    return model, scaler, classes, metrics
+
+
+def _files_sha256(bundle_dir):
+    hashes = {}
+    for root, _, files in os.walk(bundle_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            hashes[os.path.relpath(path, bundle_dir)] = file_sha256(path)
+    return dict(sorted(hashes.items()))
+
+
+def write_bundle(model, scaler, classes, metrics, config, data_path, data_sha256, n_rows, bundle_dir):
+    """Saves every artifact and a manifest of hashes, accuracy and training time.
+    The bundle is written next to bundle_dir and renamed into place once complete,
+    so a failed save never leaves a partial bundle behind.
+    """
+    if os.path.exists(bundle_dir):
+        raise FileExistsError(f"Bundle already exists: {bundle_dir}")
+    staging_dir = f'{bundle_dir}.{os.getpid()}.tmp'
+    os.makedirs(staging_dir)
+    try:
+        manifest = _write_bundle_files(model, scaler, classes, metrics, config, data_path, data_sha256, n_rows,
+                                       staging_dir, os.path.basename(bundle_dir))
+        os.rename(staging_dir, bundle_dir)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    return manifest
+
+
+def _write_bundle_files(model, scaler, classes, metrics, config, data_path, data_sha256, n_rows, bundle_dir,
+                        version):
+    import tensorflow as tf
+
+    # A Keras 2 model saved to a directory is a SavedModel, the format of the live artifact
+    model.save(os.path.join(bundle_dir, BUNDLE_FILES['model']))
+    export_model(model, scaler, os.path.join(bundle_dir, BUNDLE_FILES['numpy_model']))
+    with open(os.path.join(bundle_dir, BUNDLE_FILES['scaler']), 'wb') as scaler_file:
+        pickle.dump(scaler, scaler_file)
+    # The app decodes predictions by indexing this array, as with LabelEncoder.classes_
+    with open(os.path.join(bundle_dir, BUNDLE_FILES['label_encoder']), 'wb') as label_encoder_file:
+        pickle.dump(np.asarray(classes, dtype=object), label_encoder_file)
+
+    manifest = {
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'data': {'path': data_path, 'sha256': data_sha256, 'rows': n_rows},
+        'features': FEATURES,
+        'classes': [str(label) for label in classes],
+        'config': config,
+        'metrics': metrics,
+        'environment': {'python': platform.python_version(), 'tensorflow': tf.__version__,
+                        'keras': import_keras().__version__,
+                        'numpy': np.__version__, 'cpu_count': os.cpu_count()},
+        'files': _files_sha256(bundle_dir),
+    }
+    with open(os.path.join(bundle_dir, 'manifest.json'), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+
+def install_bundle(bundle_dir, target_dir=BASE_DIR):
+    """Copies a bundle's artifacts over the live ones used by the app."""
+    for name in BUNDLE_FILES.values():
+        source, target = os.path.join(bundle_dir, name), os.path.join(target_dir, name)
+        if os.path.isdir(source):
+            # Copy next to the target first, so the live model is replaced in one rename
+            staging = f'{target}.{os.getpid()}.tmp'
+            shutil.copytree(source, staging)
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            os.replace(staging, target)
+        else:
+            shutil.copy2(source, f'{target}.{os.getpid()}.tmp')
+            os.replace(f'{target}.{os.getpid()}.tmp', target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=DATA_PATH, help="Raw CSV, or cleaned Parquet file or directory")
+    parser.add_argument('--output-dir', default=ARTIFACTS_DIR, help="Where versioned bundles are written")
+    parser.add_argument('--version', help="Bundle name (default: UTC timestamp and data hash)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_CONFIG['seed'])
+    parser.add_argument('--epochs', type=int, default=DEFAULT_CONFIG['epochs'])
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_CONFIG['batch_size'])
+    parser.add_argument('--patience', type=int, default=DEFAULT_CONFIG['patience'], help="Early stopping patience")
+    parser.add_argument('--install', action='store_true', help="Replace the live artifacts with the new bundle")
+    parser.add_argument('--verbose', type=int, default=0, choices=[0, 1, 2])
+    args = parser.parse_args()
+
+    config = {**DEFAULT_CONFIG, 'seed': args.seed, 'epochs': args.epochs, 'batch_size': args.batch_size,
+              'patience': args.patience}
+    crop_data, data_sha256 = load_training_data(args.data)
+    version = args.version or f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{data_sha256[:8]}"
+    bundle_dir = os.path.join(args.output_dir, version)
+    # Fail before training rather than after it
+    if os.path.exists(bundle_dir):
+        parser.error(f"bundle {bundle_dir} already exists; pick another --version")
+
+    model, scaler, classes, metrics = train(crop_data, config, verbose=args.verbose)
+    manifest = write_bundle(model, scaler, classes, metrics, config, args.data, data_sha256,
+                            len(crop_data), bundle_dir)
+    print(json.dumps(manifest['metrics'], indent=2))
+    print(f"Wrote {bundle_dir}")
+
+    if args.install:
+        install_bundle(bundle_dir)
+        print(f"Installed {version} into {BASE_DIR}; rerun quantize_model.py to refresh the quantized variants")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())